@@ -0,0 +1,67 @@
+"""
+Mide el arranque de un proceso Django (setup + URLs + admin + vistas) con los
+backends de parsers cargados de forma perezosa (como ahora) frente a cargarlos
+al inicio (como cuando parsers.py importaba pandas/pdfplumber a nivel de módulo).
+
+Uso:  python benchmarks/startup.py [--runs 7]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, os, resource, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import catalogo.admin, catalogo.views
+if {eager}:
+    import catalogo.utils.parsers, pdfplumber
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in ("pandas", "numpy", "pdfplumber") if m in sys.modules],
+}}))
+"""
+
+
+def run(eager: bool, runs: int):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD.format(eager=eager)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(s["seconds"] for s in samples),
+        "max_rss_mb": statistics.median(s["max_rss_mb"] for s in samples),
+        "loaded": samples[-1]["loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    lazy = run(False, args.runs)
+    eager = run(True, args.runs)
+    for label, r in (("perezoso", lazy), ("al inicio", eager)):
+        print(f"{label:>10}: {r['seconds'] * 1000:7.0f} ms  {r['max_rss_mb']:6.1f} MB  "
+              f"cargados: {', '.join(r['loaded']) or '-'}")
+    print(f"{'ahorro':>10}: {(eager['seconds'] - lazy['seconds']) * 1000:7.0f} ms  "
+          f"{eager['max_rss_mb'] - lazy['max_rss_mb']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,40 @@
-from django.contrib import admin
-from .models import Supplier, Product, ProductIdentifier, SupplierProduct
-from .forms import SupplierProductInlineForm
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+
+from .models import Supplier, Product, ProductIdentifier, SupplierProduct, UnmatchedIdentifier, ImportJob
+from .forms import SupplierProductInlineForm, IdentifierUploadForm
+from .services.offer_cache import get_best_offers, cache_stats
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    En tablas enormes el COUNT(*) del changelist sin filtros es lo más caro de la página.
+    En PostgreSQL usa la estimación del planner (pg_class.reltuples) cuando pasa de
+    APPROX_THRESHOLD filas; con filtros/búsqueda o en otros motores cuenta normal.
+    """
+    APPROX_THRESHOLD = 100_000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            conn = connections[qs.db]
+            if conn.vendor == "postgresql":
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                        [qs.model._meta.db_table],
+                    )
+                    row = cur.fetchone()
+                if row and row[0] > self.APPROX_THRESHOLD:
+                    return int(row[0])
+        return super().count
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
@@ -11,22 +45,45 @@ class ProductIdentifierInline(admin.TabularInline):
     model = ProductIdentifier
     extra = 1
 
+    def get_queryset(self, request):
+        # __str__ usa product.name; sin esto es una consulta por fila
+        return super().get_queryset(request).select_related("product")
+
 class SupplierProductInline(admin.TabularInline):
     model = SupplierProduct
     form = SupplierProductInlineForm
     extra = 1
-    autocomplete_fields = ("supplier",)  # opcional, si tu admin usa autocomplete
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("supplier", "product")
 
     # Pasamos el producto actual al form para construir choices
     def get_formset(self, request, obj=None, **kwargs):
         FormSet = super().get_formset(request, obj, **kwargs)
         product_instance = obj  # el Product que se está editando
 
-        # Cerramos sobre el Form original para inyectar el product_instance
+        # Choices calculados UNA vez por formset (al crear el primer form) y compartidos
+        # por todos; antes cada form consultaba identificadores y proveedores por su cuenta
+        shared = {}
+
+        def shared_choices():
+            if not shared:
+                shared["identifier_values"] = (
+                    list(product_instance.identifiers.values_list("value", flat=True))
+                    if product_instance is not None and product_instance.pk else []
+                )
+                shared["supplier_choices"] = [("", "---------")] + list(
+                    Supplier.objects.order_by("name").values_list("pk", "name")
+                )
+            return shared
+
+        # Cerramos sobre el Form original para inyectar los choices
         original_init = FormSet.form.__init__
 
         def form_init(form_self, *args, **kw):
             kw.setdefault("product_instance", product_instance)
+            for key, value in shared_choices().items():
+                kw.setdefault(key, value)
             return original_init(form_self, *args, **kw)
 
         FormSet.form.__init__ = form_init
@@ -34,12 +91,113 @@ class SupplierProductInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("name", "base_sku")
-    search_fields = ("name", "base_sku", "identifiers__value")
+    list_display = ("name", "base_sku", "best_offer")
+    search_fields = ("name", "base_sku")
     inlines = [ProductIdentifierInline, SupplierProductInline]
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Identificadores por subconsulta (pk IN ...) en vez de JOIN: sin filas
+        # duplicadas y sin DISTINCT sobre todo el catálogo. Sigue siendo
+        # icontains, como la búsqueda por identifiers__value de antes.
+        base = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if term:
+            ids = ProductIdentifier.objects.filter(value__icontains=term).values("product_id")
+            queryset |= base.filter(pk__in=ids)
+        return queryset, may_have_duplicates
+
+    def get_changelist_instance(self, request):
+        # Mejores ofertas de la página de un jalón (caché versionada; una consulta para los faltantes)
+        cl = super().get_changelist_instance(request)
+        best = get_best_offers(p.pk for p in cl.result_list)
+        for p in cl.result_list:
+            p._best_offer = best.get(p.pk)
+        return cl
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {"offer_cache_stats": cache_stats(), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    @admin.display(description="Mejor oferta")
+    def best_offer(self, obj):
+        offer = getattr(obj, "_best_offer", None)
+        if not offer:
+            return "—"
+        return f"${offer['price']} · {offer['supplier']} ({offer['stock']})"
+
+    # Carga masiva de identificadores (botón en el listado de productos)
+    def get_urls(self):
+        custom = [
+            path(
+                "load-identifiers/",
+                self.admin_site.admin_view(self.load_identifiers_view),
+                name="catalogo_product_load_identifiers",
+            ),
+        ]
+        return custom + super().get_urls()
+
+    def load_identifiers_view(self, request):
+        from .services.identifiers import read_identifier_master, load_identifiers
+
+        if not self.has_add_permission(request):
+            return redirect("admin:catalogo_product_changelist")
+        form = IdentifierUploadForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            uploaded = form.cleaned_data["file"]
+            try:
+                stats = load_identifiers(
+                    read_identifier_master(uploaded, uploaded.name),
+                    dry_run=form.cleaned_data["dry_run"],
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(
+                    request,
+                    f"{stats['created']} identificadores nuevos, {stats['existing']} ya existían, "
+                    f"{stats['duplicates']} repetidos en el archivo, {stats['invalid_gtin']} UPC/EAN inválidos, "
+                    f"{stats['created_products']} productos creados"
+                    + (" (solo validación)" if form.cleaned_data["dry_run"] else ""),
+                )
+                if stats["invalid_samples"]:
+                    messages.warning(request, "Verificador inválido: " + ", ".join(stats["invalid_samples"]))
+                return redirect("admin:catalogo_product_changelist")
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Cargar identificadores",
+            "form": form,
+        }
+        return TemplateResponse(request, "admin/catalogo/product/load_identifiers.html", context)
 
 @admin.register(SupplierProduct)
 class SupplierProductAdmin(admin.ModelAdmin):
-    list_display = ("supplier", "product", "identifier_value", "price", "stock", "last_seen")
+    list_display = ("supplier", "product", "identifier_value", "price", "stock", "is_active", "last_seen")
     search_fields = ("product__name", "identifier_value")
+    list_filter = ("supplier", "is_active")
+    list_select_related = ("supplier", "product")
+    autocomplete_fields = ("supplier", "product")
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+@admin.register(UnmatchedIdentifier)
+class UnmatchedIdentifierAdmin(admin.ModelAdmin):
+    list_display = ("supplier", "identifier_value", "occurrences", "last_price", "last_stock", "first_seen", "last_seen")
+    search_fields = ("identifier_value", "normalized_value")
+    list_filter = ("supplier",)
+    ordering = ("-occurrences",)
+    list_select_related = ("supplier",)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("supplier", "filename", "processed_rows", "created_links", "updated_links", "unmatched_rows",
+                    "cursor_source", "cursor_offset", "started_at", "finished_at", "abandoned_at")
     list_filter = ("supplier",)
+    ordering = ("-started_at",)
+    list_select_related = ("supplier",)
+    readonly_fields = ("file_hash", "cursor_source", "cursor_offset")
@@ -5,3 +5,6 @@ class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
     verbose_name = "Catálogo multiproveedor"
+
+    def ready(self):
+        from . import signals  # noqa: F401
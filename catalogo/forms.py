@@ -5,6 +5,13 @@ class CatalogUploadForm(forms.Form):
     supplier = forms.ModelChoiceField(queryset=Supplier.objects.all(), label="Proveedor")
     file = forms.FileField(label="Archivo del proveedor (.xlsx o .pdf)")  # ← antes decía solo .xlsx
     notes = forms.CharField(required=False, widget=forms.Textarea(attrs={"rows": 2}))
+
+
+class IdentifierUploadForm(forms.Form):
+    file = forms.FileField(label="Maestro producto → identificadores (.csv o .xlsx)")
+    dry_run = forms.BooleanField(required=False, label="Solo validar (no insertar)")
+
+
 class SupplierProductInlineForm(forms.ModelForm):
     """
     Reemplaza 'identifier_value' por un Select con opciones =
@@ -18,20 +25,26 @@ class SupplierProductInlineForm(forms.ModelForm):
         fields = ["supplier", "identifier_value", "price", "stock"]
 
     def __init__(self, *args, **kwargs):
-        # 'product_instance' la inyectaremos desde el admin
+        # 'product_instance', 'identifier_values' y 'supplier_choices' los inyecta el admin
+        # una vez por formset; así N filas no disparan N consultas.
         product_instance = kwargs.pop("product_instance", None)
+        identifier_values = kwargs.pop("identifier_values", None)
+        supplier_choices = kwargs.pop("supplier_choices", None)
         super().__init__(*args, **kwargs)
 
         # Proveedor: dropdown normal
         self.fields["supplier"].label = "Proveedor"
+        if supplier_choices is not None:
+            self.fields["supplier"].choices = supplier_choices
 
         # Si tenemos el producto, armamos choices con sus identificadores
-        if product_instance is not None:
-            ids_qs = ProductIdentifier.objects.filter(product=product_instance).values_list("value", flat=True)
-            id_values = list(ids_qs)
-            if id_values:
-                self.fields["identifier_value"] = forms.ChoiceField(
-                    label="Identifier",
-                    choices=[("", "— elegir —")] + [(v, v) for v in id_values],
-                    required=True,
-                )
\ No newline at end of file
+        if identifier_values is None and product_instance is not None:
+            identifier_values = list(
+                ProductIdentifier.objects.filter(product=product_instance).values_list("value", flat=True)
+            )
+        if identifier_values:
+            self.fields["identifier_value"] = forms.ChoiceField(
+                label="Identifier",
+                choices=[("", "— elegir —")] + [(v, v) for v in identifier_values],
+                required=True,
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.services.export import iter_price_list, iter_csv_lines, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Exporta la lista de precios consolidada (producto, identificadores, precio/stock por proveedor, mejor precio)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+        parser.add_argument("--output", "-o", help="Archivo destino (CSV: salida estándar si se omite)")
+        parser.add_argument("--inactive", action="store_true", help="Incluye ofertas desactivadas")
+
+    def handle(self, format="csv", output=None, inactive=False, **options):
+        rows = iter_price_list(include_inactive=inactive)
+        if format == "xlsx":
+            if not output:
+                raise CommandError("--output es obligatorio para XLSX")
+            write_xlsx(rows, output)
+            return
+        if not output:
+            for line in iter_csv_lines(rows):
+                self.stdout.write(line, ending="")
+            return
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            f.writelines(iter_csv_lines(rows))
@@ -0,0 +1,42 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.models import Supplier
+from catalogo.services.catalog_import import run_catalog_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa el catálogo de un proveedor (.xlsx/.pdf) confirmando por lotes; "
+        "si una corrida anterior del mismo archivo quedó a medias, la reanuda"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("supplier", help="Nombre del proveedor")
+        parser.add_argument("path", help="Ruta del catálogo")
+        parser.add_argument("--force", action="store_true", help="Reimporta aunque el archivo ya se haya importado")
+
+    def handle(self, supplier, path, force=False, **options):
+        try:
+            supplier_obj = Supplier.objects.get(name=supplier)
+        except Supplier.DoesNotExist:
+            raise CommandError(f"No existe el proveedor {supplier!r}")
+        try:
+            with open(path, "rb") as f:
+                file_bytes = f.read()
+            job, state = run_catalog_import(supplier_obj, os.path.basename(path), file_bytes, force=force)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if state == "omitido":
+            self.stdout.write(self.style.WARNING(
+                f"Ya importado en la corrida #{job.pk} ({job.finished_at:%Y-%m-%d %H:%M}); use --force para repetir"
+            ))
+            return
+        self.stdout.write(
+            f"Corrida #{job.pk} ({state}) | filas: {job.processed_rows} | nuevos: {job.created_links} | "
+            f"actualizados: {job.updated_links} | sin coincidencia: {job.unmatched_rows} | "
+            f"desactivados: {job.stale_rows} | repetidos consolidados: {job.collapsed_rows}"
+        )
+        self.stdout.write(self.style.SUCCESS("Listo"))
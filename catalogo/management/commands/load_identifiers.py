@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.services.identifiers import read_identifier_master, load_identifiers
+
+
+class Command(BaseCommand):
+    help = "Carga en bloque identificadores (MPN/UPC/EAN/SKU) desde un maestro producto→identificadores (.csv/.xlsx)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Ruta del archivo maestro")
+        parser.add_argument("--dry-run", action="store_true", help="Solo valida y reporta, no inserta")
+
+    def handle(self, path, dry_run=False, **options):
+        try:
+            with open(path, "rb") as f:
+                df = read_identifier_master(f, path)
+            stats = load_identifiers(df, dry_run=dry_run)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Filas: {stats['rows']} | identificadores: {stats['identifiers']} | "
+            f"nuevos: {stats['created']} | ya existían: {stats['existing']} | "
+            f"repetidos en archivo: {stats['duplicates']} | UPC/EAN inválidos: {stats['invalid_gtin']} | "
+            f"demasiado largos: {stats['too_long']} | productos creados: {stats['created_products']}"
+        )
+        if stats["invalid_samples"]:
+            self.stdout.write("Verificador inválido: " + ", ".join(stats["invalid_samples"]))
+        if dry_run:
+            self.stdout.write(self.style.WARNING("--dry-run: no se insertó nada"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Listo"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.services.dedupe import merge_duplicate_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida productos duplicados que comparten GTIN/MPN (en identificadores o vínculos de proveedor) "
+        "en el de pk menor"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo reporta los grupos, no modifica nada")
+
+    def handle(self, dry_run=False, **options):
+        stats = merge_duplicate_products(dry_run=dry_run)
+        self.stdout.write(
+            f"Aristas: {stats['edges']} | grupos: {stats['groups']} | duplicados: {stats['duplicates']} | "
+            f"identificadores movidos: {stats['identifiers_moved']} | vínculos movidos: {stats['links_moved']}"
+        )
+        for (canonical, name), dups in stats["samples"]:
+            self.stdout.write(f"  #{canonical} {name} <- " + ", ".join(f"#{pk} {n}" for pk, n in dups))
+        if dry_run:
+            self.stdout.write(self.style.WARNING("--dry-run: no se modificó nada"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Listo"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.services.offer_cache import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra los aciertos/fallos de la caché de ofertas por producto "
+        "(con LocMemCache cada proceso tiene los suyos; use un backend compartido para verlos aquí)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Pone los contadores en cero después de mostrarlos")
+
+    def handle(self, reset=False, **options):
+        stats = cache_stats()
+        self.stdout.write(
+            f"Aciertos: {stats['hits']} | fallos: {stats['misses']} | tasa de acierto: {stats['hit_rate']:.1%}"
+        )
+        if reset:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierproduct',
+            name='is_active',
+            field=models.BooleanField(default=True, help_text='Falso si el proveedor dejó de listarlo'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierproduct',
+            index=models.Index(fields=['supplier', 'last_seen'], name='supplierproduct_sup_seen_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_supplierproduct_is_active_last_seen_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnmatchedIdentifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifier_value', models.CharField(max_length=64)),
+                ('normalized_value', models.CharField(db_index=True, help_text='Mayúsculas y sin espacios', max_length=64)),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('last_price', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_stock', models.IntegerField(default=0)),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unmatched', to='catalogo.supplier')),
+            ],
+            options={
+                'unique_together': {('supplier', 'identifier_value')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0003_unmatchedidentifier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('file_hash', models.CharField(db_index=True, help_text='SHA-256 del archivo (y del mapeo de columnas)', max_length=64)),
+                ('cursor_source', models.CharField(blank=True, help_text='Hoja/sección del último lote confirmado', max_length=200)),
+                ('cursor_offset', models.IntegerField(blank=True, help_text='Fila inicial del último lote confirmado', null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_links', models.PositiveIntegerField(default=0)),
+                ('updated_links', models.PositiveIntegerField(default=0)),
+                ('created_products', models.PositiveIntegerField(default=0)),
+                ('unmatched_rows', models.PositiveIntegerField(default=0)),
+                ('collapsed_rows', models.PositiveIntegerField(default=0)),
+                ('stale_rows', models.PositiveIntegerField(default=0)),
+                ('notes', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='catalogo.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['supplier', 'file_hash'], name='importjob_sup_hash_idx')],
+            },
+        ),
+    ]
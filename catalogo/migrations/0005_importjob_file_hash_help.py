@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='file_hash',
+            field=models.CharField(db_index=True, help_text='SHA-256 del archivo y de la configuración de importación', max_length=64),
+        ),
+    ]
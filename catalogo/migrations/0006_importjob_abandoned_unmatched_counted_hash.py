@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_importjob_file_hash_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='abandoned_at',
+            field=models.DateTimeField(blank=True, help_text='Corrida sin terminar que ya no se puede reanudar', null=True),
+        ),
+        migrations.AddField(
+            model_name='unmatchedidentifier',
+            name='counted_hash',
+            field=models.CharField(blank=True, help_text='Huella (ImportJob.file_hash) de la última corrida que sumó ocurrencias', max_length=64),
+        ),
+    ]
@@ -50,9 +50,64 @@ class SupplierProduct(models.Model):
     price = models.DecimalField(max_digits=12, decimal_places=2)
     stock = models.IntegerField(default=0)
     last_seen = models.DateTimeField(default=timezone.now)
+    is_active = models.BooleanField(default=True, help_text="Falso si el proveedor dejó de listarlo")
 
     class Meta:
         unique_together = [("supplier", "identifier_value")]
+        indexes = [models.Index(fields=["supplier", "last_seen"], name="supplierproduct_sup_seen_idx")]
 
     def __str__(self):
         return f"{self.supplier.name} → {self.product.name} (${self.price})"
+
+
+class UnmatchedIdentifier(models.Model):
+    """Identificador de un catálogo de proveedor que aún no tiene ProductIdentifier."""
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name="unmatched")
+    identifier_value = models.CharField(max_length=64)
+    normalized_value = models.CharField(max_length=64, db_index=True, help_text="Mayúsculas y sin espacios")
+    occurrences = models.PositiveIntegerField(default=0)
+    last_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_stock = models.IntegerField(default=0)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+    counted_hash = models.CharField(max_length=64, blank=True,
+                                    help_text="Huella (ImportJob.file_hash) de la última corrida que sumó ocurrencias")
+
+    class Meta:
+        unique_together = [("supplier", "identifier_value")]
+
+    def __str__(self):
+        return f"{self.supplier.name}: {self.identifier_value} (x{self.occurrences})"
+
+
+class ImportJob(models.Model):
+    """Corrida de importación de un catálogo con su punto de control para reanudarla."""
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name="import_jobs")
+    filename = models.CharField(max_length=255)
+    file_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 del archivo y de la configuración de importación")
+    cursor_source = models.CharField(max_length=200, blank=True, help_text="Hoja/sección del último lote confirmado")
+    cursor_offset = models.IntegerField(null=True, blank=True, help_text="Fila inicial del último lote confirmado")
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_links = models.PositiveIntegerField(default=0)
+    updated_links = models.PositiveIntegerField(default=0)
+    created_products = models.PositiveIntegerField(default=0)
+    unmatched_rows = models.PositiveIntegerField(default=0)
+    collapsed_rows = models.PositiveIntegerField(default=0)
+    stale_rows = models.PositiveIntegerField(default=0)
+    notes = models.TextField(blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    abandoned_at = models.DateTimeField(null=True, blank=True,
+                                        help_text="Corrida sin terminar que ya no se puede reanudar")
+
+    class Meta:
+        indexes = [models.Index(fields=["supplier", "file_hash"], name="importjob_sup_hash_idx")]
+
+    def __str__(self):
+        if self.finished_at:
+            state = "terminada"
+        elif self.abandoned_at:
+            state = "abandonada"
+        else:
+            state = f"en {self.cursor_source or 'inicio'}:{self.cursor_offset or 0}"
+        return f"{self.supplier.name} · {self.filename} ({state})"
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from catalogo.models import Supplier, ProductIdentifier, SupplierProduct, ImportJob
+from catalogo.utils.registry import parse_catalog_batches
+from .offer_cache import bump_supplier_generation
+from .stale import sweep_stale_offers
+from .unmatched import normalize_identifier, queue_unmatched, drop_matched, CHUNK
+
+if TYPE_CHECKING:  # parsers importa pandas; solo se carga al importar un catálogo
+    from catalogo.utils.parsers import RecordBatch
+
+# identifier -> product_id, exacto y normalizado (mayúsculas, sin espacios)
+IdentifierMaps = Tuple[Dict[str, int], Dict[str, int]]
+
+
+def load_identifier_maps() -> IdentifierMaps:
+    """Carga una sola vez el mapa identificador -> product_id usado para empatar."""
+    id_map = dict(ProductIdentifier.objects.values_list("value", "product_id"))
+    id_map_norm = {normalize_identifier(k): v for k, v in id_map.items()}
+    return id_map, id_map_norm
+
+
+def match_batch(batch: RecordBatch, maps: IdentifierMaps) -> List[int]:
+    """product_id por registro del lote (None si no hay coincidencia)."""
+    id_map, id_map_norm = maps
+    return [
+        id_map.get(ident) or id_map_norm.get(normalize_identifier(ident))
+        for ident in batch.identifiers
+    ]
+
+
+def collect_unmatched(batch: RecordBatch, product_ids: List[int], unmatched: Dict[str, Tuple[float, int, int]]) -> None:
+    """Acumula en unmatched: ident -> (último precio, último stock, ocurrencias)."""
+    prices, stocks = batch.prices.tolist(), batch.stocks.tolist()
+    for ident, product_id, price, stock in zip(batch.identifiers, product_ids, prices, stocks):
+        if product_id:
+            continue
+        _, _, seen = unmatched.get(ident, (0, 0, 0))
+        unmatched[ident] = (price, stock, seen + 1)
+
+
+def write_offer_batch(supplier: Supplier, batch: RecordBatch, product_ids: List[int], seen_at: datetime) -> Tuple[int, int]:
+    """
+    Escribe los registros empatados del lote con un solo upsert por bloque
+    (bulk_create con update_conflicts sobre (supplier, identifier_value)) en vez
+    de un update_or_create por fila. Dentro del lote gana la última aparición
+    de cada identificador. Devuelve (creados, actualizados).
+    """
+    latest = {}
+    prices, stocks = batch.prices.tolist(), batch.stocks.tolist()
+    for ident, product_id, price, stock in zip(batch.identifiers, product_ids, prices, stocks):
+        if product_id:
+            latest[ident] = (product_id, price, stock)
+    if not latest:
+        return 0, 0
+
+    updated = 0
+    idents = list(latest)
+    for start in range(0, len(idents), CHUNK):
+        keys = idents[start:start + CHUNK]
+        # Solo para el conteo creados/actualizados
+        updated += SupplierProduct.objects.filter(supplier=supplier, identifier_value__in=keys).count()
+        SupplierProduct.objects.bulk_create(
+            [
+                SupplierProduct(
+                    supplier=supplier,
+                    identifier_value=ident,
+                    product_id=latest[ident][0],
+                    price=round(latest[ident][1], 2),
+                    stock=latest[ident][2],
+                    last_seen=seen_at,
+                    is_active=True,
+                )
+                for ident in keys
+            ],
+            update_conflicts=True,
+            unique_fields=["supplier", "identifier_value"],
+            update_fields=["product", "price", "stock", "last_seen", "is_active"],
+        )
+    # bulk_create no dispara señales: invalidamos la caché de ofertas del proveedor
+    bump_supplier_generation(supplier.pk)
+    return len(idents) - updated, updated
+
+
+def import_fingerprint(file_bytes: bytes, column_map: Optional[Dict[str, Dict[str, str]]] = None, *,
+                       usd_mxn_rate: Optional[float] = None, policy: Optional[Dict[str, Any]] = None) -> str:
+    """
+    SHA-256 del archivo más todo lo que cambia el resultado: mapeo de columnas,
+    tipo de cambio y política de consolidación del proveedor.
+    """
+    digest = hashlib.sha256(file_bytes)
+    extra = {"column_map": column_map or None, "usd_mxn_rate": usd_mxn_rate, "policy": policy}
+    digest.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def resume_cutoff() -> timedelta:
+    """Antigüedad máxima (settings.IMPORT_RESUME_MAX_HOURS) de una corrida sin terminar que se puede reanudar."""
+    return timedelta(hours=float(getattr(settings, "IMPORT_RESUME_MAX_HOURS", 12)))
+
+
+def run_catalog_import(supplier: Supplier, file_name: str, file_bytes: bytes, *,
+                       column_map: Optional[Dict[str, Dict[str, str]]] = None,
+                       force: bool = False) -> Tuple[ImportJob, str]:
+    """
+    Importa el catálogo lote por lote. Cada lote se confirma en su propia
+    transacción junto con el punto de control del ImportJob (hoja, fila
+    inicial), así que si el proceso muere se pierde a lo más el lote en curso.
+    - Si hay una corrida sin terminar de la misma huella, reciente
+      (resume_cutoff) y sin otra importación terminada del proveedor después
+      de ella, se reanuda desde el último lote confirmado. Las más viejas se
+      ignoran: reanudarlas pisaría precios nuevos con los del archivo viejo.
+      Si el punto de control ya no está entre los lotes leídos, esa corrida
+      se marca abandonada y se empieza una nueva.
+    - Si la última corrida terminada del proveedor es esta misma huella, se
+      omite (force=True la repite; el upsert por (supplier, identifier_value)
+      no duplica nada). Un archivo anterior que se vuelve a subir sí se importa.
+    Devuelve (job, estado) con estado "importado", "reanudado" u "omitido".
+    """
+    from catalogo.utils.parsers import consolidate_batches, consolidation_policy_for
+
+    usd_mxn_rate = float(getattr(settings, "USD_MXN_RATE", 18.5))
+    policy = consolidation_policy_for(supplier.name)
+    file_hash = import_fingerprint(file_bytes, column_map, usd_mxn_rate=usd_mxn_rate, policy=policy)
+
+    supplier_jobs = ImportJob.objects.filter(supplier=supplier)
+    last_done = supplier_jobs.filter(finished_at__isnull=False).order_by("-finished_at").first()
+    if not force and last_done and last_done.file_hash == file_hash:
+        return last_done, "omitido"
+
+    job = (
+        supplier_jobs
+        .filter(file_hash=file_hash, finished_at__isnull=True, abandoned_at__isnull=True,
+                started_at__gte=timezone.now() - resume_cutoff())
+        .order_by("-started_at")
+        .first()
+    )
+    if job and last_done and last_done.started_at > job.started_at:
+        job = None  # otra importación terminó después: ya no es reanudable
+    state = "reanudado" if job else "importado"
+    if job is None:
+        job = ImportJob.objects.create(supplier=supplier, filename=file_name, file_hash=file_hash)
+
+    # Mapa de identificadores -> product_id (una sola carga)
+    maps = load_identifier_maps()
+
+    # El orden de los lotes es determinista para el mismo archivo y mapeo,
+    # por eso (hoja, fila inicial) basta como cursor.
+    skipped: List[str] = []
+    batches = parse_catalog_batches(
+        supplier.name,
+        file_name,
+        file_bytes,
+        usd_mxn_rate=usd_mxn_rate,
+        sheet_workers=int(getattr(settings, "CATALOG_SHEET_WORKERS", 1)),
+        column_map=column_map,
+        skipped=skipped,
+    )
+    batches, collapsed = consolidate_batches(batches, price=policy["price"], stock=policy["stock"])
+
+    skipping = job.cursor_offset is not None
+    if skipping and (job.cursor_source, job.cursor_offset) not in {(b.source, b.offset) for b in batches}:
+        # Esta lectura dio otros lotes (una hoja falló distinto, murió un proceso del pool...):
+        # el cursor ya no sirve. Se descarta la corrida y se empieza de cero.
+        job.abandoned_at = timezone.now()
+        job.notes = f"Abandonada: el punto de control {job.cursor_source}:{job.cursor_offset} no está en el archivo"
+        job.save(update_fields=["abandoned_at", "notes"])
+        job = ImportJob.objects.create(supplier=supplier, filename=file_name, file_hash=file_hash)
+        state, skipping = "importado", False
+    job.collapsed_rows = collapsed
+
+    for batch in batches:
+        if skipping:
+            # Lotes ya confirmados en la corrida anterior
+            if (batch.source, batch.offset) == (job.cursor_source, job.cursor_offset):
+                skipping = False
+            continue
+        _apply_batch(job, batch, maps)
+
+    with transaction.atomic():
+        # Todo lo que esta corrida no tocó quedó con last_seen < started_at.
+        # Solo si el archivo se leyó completo y trajo filas: una hoja ilegible no
+        # debe dejar en 0 el stock de todo lo que venía en ella.
+        if skipped:
+            job.notes = "Hojas omitidas, no se desactivaron ofertas ausentes:\n" + "\n".join(skipped)
+            job.stale_rows = 0
+        else:
+            job.stale_rows = sweep_stale_offers(supplier, job.started_at) if job.processed_rows else 0
+        job.finished_at = timezone.now()
+        job.save(update_fields=["collapsed_rows", "stale_rows", "notes", "finished_at"])
+    return job, state
+
+
+def _apply_batch(job: ImportJob, batch: RecordBatch, maps: IdentifierMaps) -> None:
+    """Escribe un lote y avanza el cursor del job en la misma transacción."""
+    product_ids = match_batch(batch, maps)
+    unmatched: Dict[str, Tuple[float, int, int]] = {}
+    collect_unmatched(batch, product_ids, unmatched)
+    with transaction.atomic():
+        created, updated = write_offer_batch(job.supplier, batch, product_ids, timezone.now())
+        # Los no empatados quedan en cola; se promueven solos al registrar su identificador
+        queue_unmatched(job.supplier, unmatched, seen_at=job.started_at, run_hash=job.file_hash)
+        # Los que ya empatan (p. ej. registrados después de otra corrida) salen de la cola:
+        # si no, una promoción posterior pisaría esta oferta con su precio viejo
+        drop_matched(job.supplier, [i for i, pid in zip(batch.identifiers, product_ids) if pid])
+        job.cursor_source, job.cursor_offset = batch.source, batch.offset
+        job.processed_rows += len(batch)
+        job.created_links += created
+        job.updated_links += updated
+        job.unmatched_rows += len(unmatched)
+        job.save(update_fields=["cursor_source", "cursor_offset", "processed_rows",
+                                "created_links", "updated_links", "unmatched_rows"])
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import BigIntegerField
+from django.db.models.expressions import RawSQL
+
+from catalogo.models import Product, ProductIdentifier, SupplierProduct
+from .offer_cache import bump_supplier_generation
+from .unmatched import normalize_identifier, CHUNK
+
+# Igual que identifiers.GTIN_PATTERN (12–14 dígitos ASCII)
+GTIN_RE = re.compile(r"^[0-9]{12,14}$")
+MPN_RE = re.compile(r"[A-Za-z\-]")
+# Evita unir por valores genéricos como "N/A" o "-"
+MIN_MPN_LENGTH = 4
+SAMPLE_GROUPS = 20
+# Cada duplicado usa 3 parámetros en el UPDATE (IN + WHEN/THEN); SQLite limita los parámetros
+REASSIGN_CHUNK = 250
+
+
+def identity_key(value: str, id_type: Optional[str] = None) -> Optional[str]:
+    """
+    Llave de identidad física: GTIN rellenado a 14 dígitos o MPN normalizado.
+    Los SKU alternos no cuentan (son propios de cada proveedor). Sin id_type
+    se clasifica igual que infer_id_type.
+    """
+    value = str(value or "").strip()
+    if id_type is None:
+        id_type = (ProductIdentifier.UPC_EAN if GTIN_RE.match(value)
+                   else ProductIdentifier.MPN if MPN_RE.search(value) else ProductIdentifier.SKU_ALT)
+    if id_type == ProductIdentifier.UPC_EAN and GTIN_RE.match(value):
+        return "G:" + value.zfill(14)
+    if id_type == ProductIdentifier.MPN:
+        mpn = normalize_identifier(value)
+        if len(mpn) >= MIN_MPN_LENGTH:
+            return "M:" + mpn
+    return None
+
+
+class UnionFind:
+    """Conjuntos disjuntos con compresión de camino y unión por tamaño (casi lineal)."""
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+        self.size: Dict[int, int] = {}
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.size[x] = 1
+            return x
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+
+def _edges(chunk_size: int = 20000) -> Iterator[Tuple[str, int]]:
+    """
+    (llave de identidad, product_id) de los identificadores y de los vínculos con
+    proveedores. El tipo del valor de un vínculo es el del ProductIdentifier con
+    el que empató (exacto o normalizado, como match_batch); si alguno lo registra
+    como SKU alterno no se usa: es propio del proveedor y uniría productos distintos.
+    """
+    types: Dict[str, str] = {}
+    for product_id, id_type, value in (
+        ProductIdentifier.objects.values_list("product_id", "id_type", "value").iterator(chunk_size=chunk_size)
+    ):
+        if types.get(value) != ProductIdentifier.SKU_ALT:
+            types[value] = id_type
+        key = identity_key(value, id_type)
+        if key:
+            yield key, product_id
+    types_norm: Dict[str, str] = {}
+    for value, id_type in types.items():
+        norm = normalize_identifier(value)
+        if types_norm.get(norm) != ProductIdentifier.SKU_ALT:
+            types_norm[norm] = id_type
+
+    for product_id, value in (
+        SupplierProduct.objects.values_list("product_id", "identifier_value").iterator(chunk_size=chunk_size)
+    ):
+        id_type = types.get(value) or types_norm.get(normalize_identifier(value))
+        if id_type is None or id_type == ProductIdentifier.SKU_ALT:
+            continue
+        key = identity_key(value, id_type)
+        if key:
+            yield key, product_id
+
+
+def find_duplicate_groups() -> Tuple[Dict[int, List[int]], int]:
+    """
+    Agrupa los productos conectados por un GTIN/MPN compartido.
+    Devuelve ({canónico (pk menor): [duplicados]}, aristas leídas).
+    """
+    uf = UnionFind()
+    first_owner: Dict[str, int] = {}
+    edges = 0
+    for key, product_id in _edges():
+        edges += 1
+        owner = first_owner.setdefault(key, product_id)
+        if owner != product_id:
+            uf.union(owner, product_id)
+
+    members: Dict[int, List[int]] = {}
+    for product_id in uf.parent:
+        members.setdefault(uf.find(product_id), []).append(product_id)
+    groups = {}
+    for ids in members.values():
+        if len(ids) > 1:
+            ids.sort()
+            groups[ids[0]] = ids[1:]
+    return groups, edges
+
+
+def _chunked(items: List[int], size: int = CHUNK) -> Iterable[List[int]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _reassign(model, canonical_of: Dict[int, int]) -> int:
+    """
+    UPDATE ... SET product_id = CASE product_id WHEN dup THEN canónico ... END por
+    bloques. CASE en SQL plano: con Case/When de Django resolver miles de
+    expresiones costaba más que el propio UPDATE.
+    """
+    moved = 0
+    for chunk in _chunked(list(canonical_of), REASSIGN_CHUNK):
+        case = "CASE product_id " + " ".join(["WHEN %s THEN %s"] * len(chunk)) + " END"
+        params = [value for dup in chunk for value in (dup, canonical_of[dup])]
+        moved += model.objects.filter(product_id__in=chunk).update(
+            product_id=RawSQL(case, params, output_field=BigIntegerField())
+        )
+    return moved
+
+
+def _count(model, product_ids: List[int]) -> int:
+    return sum(model.objects.filter(product_id__in=chunk).count() for chunk in _chunked(product_ids))
+
+
+def merge_duplicate_products(*, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Consolida los productos duplicados: identificadores y vínculos de proveedor
+    pasan al producto canónico (pk menor) con UPDATE en bloque y los duplicados
+    se borran. Con dry_run solo reporta. Devuelve un dict con los conteos y una
+    muestra de grupos: [(canónico, [duplicados])] con nombres.
+    """
+    groups, edges = find_duplicate_groups()
+    canonical_of = {dup: canonical for canonical, dups in groups.items() for dup in dups}
+    duplicates = list(canonical_of)
+
+    sample_ids = [pid for canonical, dups in list(groups.items())[:SAMPLE_GROUPS] for pid in [canonical, *dups]]
+    names = dict(Product.objects.filter(pk__in=sample_ids).values_list("pk", "name"))
+    stats: Dict[str, Any] = {
+        "edges": edges,
+        "groups": len(groups),
+        "duplicates": len(duplicates),
+        "samples": [
+            ((c, names.get(c, "")), [(d, names.get(d, "")) for d in dups])
+            for c, dups in list(groups.items())[:SAMPLE_GROUPS]
+        ],
+    }
+    if dry_run or not duplicates:
+        stats["identifiers_moved"] = _count(ProductIdentifier, duplicates)
+        stats["links_moved"] = _count(SupplierProduct, duplicates)
+        return stats
+
+    with transaction.atomic():
+        supplier_ids = set()
+        for chunk in _chunked(duplicates):
+            supplier_ids.update(
+                SupplierProduct.objects.filter(product_id__in=chunk).values_list("supplier_id", flat=True).distinct()
+            )
+        stats["identifiers_moved"] = _reassign(ProductIdentifier, canonical_of)
+        stats["links_moved"] = _reassign(SupplierProduct, canonical_of)
+        for chunk in _chunked(duplicates):
+            Product.objects.filter(pk__in=chunk).delete()
+        # update() no dispara señales: invalidamos a mano la caché de ofertas
+        bump_supplier_generation(*supplier_ids)
+    return stats
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import csv
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from catalogo.models import Supplier, ProductIdentifier, SupplierProduct
+
+EXPORT_CHUNK = 2000
+
+
+def _merge_identifiers(identifiers: Iterator[Tuple[int, str, str]], product_id: int, pending: List):
+    """
+    Avanza el iterador de identificadores (ordenado por product_id) hasta product_id
+    y devuelve los suyos. pending guarda la fila ya leída que pertenece a otro producto.
+    """
+    found = []
+    while True:
+        row = pending.pop() if pending else next(identifiers, None)
+        if row is None:
+            return found
+        if row[0] < product_id:
+            continue
+        if row[0] > product_id:
+            pending.append(row)
+            return found
+        found.append(f"{row[1]}:{row[2]}")
+
+
+def _best_offer(offers: Dict[int, Tuple[Decimal, int]]) -> Optional[int]:
+    """
+    Proveedor con el precio más bajo entre los que tienen stock (si ninguno tiene,
+    el más barato). Un precio <= 0 es un precio faltante y no compite.
+    """
+    priced = [sid for sid, (price, _) in offers.items() if price > 0]
+    candidates = [sid for sid in priced if offers[sid][1] > 0] or priced
+    return min(candidates, key=lambda sid: offers[sid][0]) if candidates else None
+
+
+def _min_price(a: Decimal, b: Decimal) -> Decimal:
+    """Mínimo ignorando precios faltantes (<= 0), salvo que ambos lo sean."""
+    if a <= 0 or b <= 0:
+        return max(a, b)
+    return min(a, b)
+
+
+def iter_price_list(*, include_inactive: bool = False, chunk_size: int = EXPORT_CHUNK) -> Iterator[List[Any]]:
+    """
+    Lista de precios consolidada: encabezado y luego una fila por producto con
+    ofertas: identificadores, precio y stock de cada proveedor y el mejor precio.
+    - Un solo recorrido de las ofertas ordenadas por product_id (.iterator), que se
+      pivotean al cambiar de producto; los identificadores se leen en paralelo,
+      también ordenados, y se cruzan por merge. Nunca se arma el dataset completo.
+    - Si un proveedor tiene varias ofertas del mismo producto: precio mínimo (sin
+      contar precios faltantes) y stock sumado.
+    """
+    suppliers = list(Supplier.objects.order_by("name").values_list("pk", "name"))
+    header = ["producto_id", "producto", "sku_base", "identificadores"]
+    for _, name in suppliers:
+        header += [f"{name} precio", f"{name} stock"]
+    yield header + ["mejor_precio", "mejor_proveedor"]
+
+    names = dict(suppliers)
+    offers_qs = SupplierProduct.objects.all() if include_inactive else SupplierProduct.objects.filter(is_active=True)
+    offers_iter = (
+        offers_qs.order_by("product_id", "supplier_id")
+        .values_list("product_id", "product__name", "product__base_sku", "supplier_id", "price", "stock")
+        .iterator(chunk_size=chunk_size)
+    )
+    identifiers = (
+        ProductIdentifier.objects.order_by("product_id", "pk")
+        .values_list("product_id", "id_type", "value")
+        .iterator(chunk_size=chunk_size)
+    )
+    pending: List = []
+
+    def build(product_id, name, base_sku, offers):
+        row = [product_id, name, base_sku or "", "|".join(_merge_identifiers(identifiers, product_id, pending))]
+        for sid, _ in suppliers:
+            price, stock = offers.get(sid, ("", ""))
+            row += [price, stock]
+        best = _best_offer(offers)
+        return row + ([offers[best][0], names[best]] if best is not None else ["", ""])
+
+    current, offers = None, {}
+    for product_id, name, base_sku, supplier_id, price, stock in offers_iter:
+        if current is not None and product_id != current[0]:
+            yield build(*current, offers)
+            offers = {}
+        current = (product_id, name, base_sku)
+        if supplier_id in offers:
+            prev_price, prev_stock = offers[supplier_id]
+            offers[supplier_id] = (_min_price(prev_price, price), prev_stock + stock)
+        else:
+            offers[supplier_id] = (price, stock)
+    if current is not None:
+        yield build(*current, offers)
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, value):
+        return value
+
+
+def iter_csv_lines(rows: Iterator[List[Any]]) -> Iterator[str]:
+    """Convierte filas a líneas CSV una por una (para StreamingHttpResponse o un archivo)."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows: Iterator[List[Any]], target) -> None:
+    """Escribe las filas en un XLSX con openpyxl en modo write-only (memoria constante)."""
+    from openpyxl import Workbook  # solo quien exporta a Excel paga esta importación
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Lista de precios")
+    for row in rows:
+        ws.append(row)
+    wb.save(target)
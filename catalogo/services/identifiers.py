@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import io
+import os
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from catalogo.models import Product, ProductIdentifier
+from catalogo.utils.parsers import normalize_header
+from .unmatched import promote_queued
+
+# Columnas del archivo maestro que describen al producto (el resto son identificadores)
+PRODUCT_NAME_COLS = ("producto", "product", "nombre", "name")
+PRODUCT_SKU_COLS = ("base_sku", "sku_interno")
+IGNORED_COLS = ("descripcion", "descripción", "description")
+
+INSERT_BATCH = 5000
+# Igual que RE_UPC_EAN de parsers, pero solo dígitos ASCII (\d acepta otros alfabetos)
+GTIN_PATTERN = r"^[0-9]{12,14}$"
+
+
+def classify_identifiers(values: pd.Series) -> pd.Series:
+    """Versión vectorizada de infer_id_type: UPC_EAN (12–14 dígitos), MPN (letras/guion) o SKU_ALT."""
+    is_gtin = values.str.match(GTIN_PATTERN)
+    is_mpn = values.str.contains(r"[A-Za-z\-]", regex=True)
+    return pd.Series(
+        np.select([is_gtin, is_mpn], [ProductIdentifier.UPC_EAN, ProductIdentifier.MPN], ProductIdentifier.SKU_ALT),
+        index=values.index,
+    )
+
+
+def gtin_checksum_ok(values: pd.Series) -> np.ndarray:
+    """
+    Valida el dígito verificador GS1 de UPC-A/EAN-13/GTIN-14 para toda la columna
+    a la vez. Espera solo dígitos (12–14); se rellenan con ceros a 14.
+    """
+    if values.empty:
+        return np.zeros(0, dtype=bool)
+    padded = values.str.zfill(14)
+    digits = np.frombuffer("".join(padded).encode("ascii"), dtype=np.uint8).reshape(-1, 14) - ord("0")
+    # Pesos 3,1,3,1... desde la izquierda en GTIN-14 (el verificador es el último)
+    weights = np.tile([3, 1], 7)[:13]
+    check = (10 - (digits[:, :13] * weights).sum(axis=1) % 10) % 10
+    return check == digits[:, 13]
+
+
+def read_identifier_master(file_obj, file_name: str) -> pd.DataFrame:
+    """Lee el maestro producto→identificadores (.csv o .xlsx) como texto, con encabezados normalizados."""
+    ext = os.path.splitext(file_name or "")[1].lower()
+    data = file_obj.read() if hasattr(file_obj, "read") else file_obj
+    if ext == ".csv":
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    elif ext in (".xlsx", ".xls"):
+        df = pd.read_excel(io.BytesIO(data), dtype=str, keep_default_na=False)
+    else:
+        raise ValueError("Formato no soportado: use .xlsx o .csv")
+    df.columns = [normalize_header(c) for c in df.columns]
+    return df
+
+
+def load_identifiers(df: pd.DataFrame, *, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Registra en bloque los identificadores de un maestro ya leído.
+    - Formato ancho: una columna de producto (PRODUCT_NAME_COLS), opcional base_sku,
+      y cualquier número de columnas de identificadores (mpn, upc, sku, ...).
+    - Tipo por regex vectorizada; los UPC/EAN con verificador inválido se rechazan.
+    - Duplicados (id_type, value) se quitan en memoria, contra el archivo y la BD,
+      y se inserta con bulk_create(ignore_conflicts=True).
+    Devuelve un dict con los conteos.
+    """
+    name_col = next((c for c in PRODUCT_NAME_COLS if c in df.columns), None)
+    if not name_col:
+        raise ValueError(f"Falta la columna de producto ({', '.join(PRODUCT_NAME_COLS)})")
+    sku_col = next((c for c in PRODUCT_SKU_COLS if c in df.columns), None)
+    id_cols = [c for c in df.columns if c not in (name_col, sku_col) and c not in IGNORED_COLS]
+    if not id_cols:
+        raise ValueError("No hay columnas de identificadores")
+
+    base = pd.DataFrame({
+        "name": df[name_col].astype(str).str.strip().str.slice(0, 200),
+        "base_sku": df[sku_col].astype(str).str.strip() if sku_col else "",
+    })
+    long = (
+        pd.concat([base.assign(value=df[c].astype(str).str.strip()) for c in id_cols], ignore_index=True)
+    )
+    long = long[(long["name"] != "") & (long["value"] != "") & ~long["value"].str.lower().isin(("nan", "none"))]
+    stats: Dict[str, Any] = {"rows": len(df), "identifiers": len(long)}
+
+    # ProductIdentifier.value admite 64 caracteres
+    too_long = long["value"].str.len() > 64
+    stats["too_long"] = int(too_long.sum())
+    long = long[~too_long]
+
+    # Clasificación y verificador GS1
+    long = long.assign(id_type=classify_identifiers(long["value"]))
+    gtin = long["id_type"] == ProductIdentifier.UPC_EAN
+    bad = np.zeros(len(long), dtype=bool)
+    bad[gtin.to_numpy()] = ~gtin_checksum_ok(long.loc[gtin, "value"])
+    stats["invalid_gtin"] = int(bad.sum())
+    stats["invalid_samples"] = long.loc[bad, "value"].head(20).tolist()
+    long = long[~bad]
+
+    # Duplicados dentro del archivo (el primero gana)
+    before = len(long)
+    long = long.drop_duplicates(["id_type", "value"], keep="first")
+    stats["duplicates"] = before - len(long)
+
+    # Ya registrados en la BD: un solo recorrido en streaming de (id_type, value)
+    existing = {
+        f"{t}\x1f{v}"
+        for t, v in ProductIdentifier.objects.values_list("id_type", "value").iterator(chunk_size=20000)
+    }
+    keys = long["id_type"] + "\x1f" + long["value"]
+    in_db = keys.isin(existing).to_numpy()
+    stats["existing"] = int(in_db.sum())
+    long = long[~in_db]
+    stats["created"] = len(long)
+
+    if dry_run or long.empty:
+        stats["created_products"] = 0
+        return stats
+
+    with transaction.atomic():
+        stats["created_products"] = _ensure_products(long)
+        product_ids = _product_id_map()
+        long = long.assign(
+            product_id=[product_ids.get((n, s or None)) for n, s in zip(long["name"], long["base_sku"])]
+        )
+        ProductIdentifier.objects.bulk_create(
+            (
+                ProductIdentifier(product_id=pid, id_type=t, value=v)
+                for pid, t, v in zip(long["product_id"], long["id_type"], long["value"])
+            ),
+            batch_size=INSERT_BATCH,
+            ignore_conflicts=True,
+        )
+        # bulk_create no dispara post_save: promovemos la cola a mano
+        values = long["value"].tolist()
+        transaction.on_commit(lambda: promote_queued(values))
+    return stats
+
+
+def _product_id_map() -> Dict[tuple, int]:
+    return {
+        (name, sku or None): pk
+        for pk, name, sku in Product.objects.values_list("pk", "name", "base_sku").iterator(chunk_size=20000)
+    }
+
+
+def _ensure_products(long: pd.DataFrame) -> int:
+    """Crea en bloque los productos (name, base_sku) del maestro que aún no existen."""
+    known = _product_id_map()
+    wanted = long[["name", "base_sku"]].drop_duplicates()
+    missing = [
+        Product(name=n, base_sku=(s or None))
+        for n, s in zip(wanted["name"], wanted["base_sku"])
+        if (n, s or None) not in known
+    ]
+    Product.objects.bulk_create(missing, batch_size=INSERT_BATCH, ignore_conflicts=True)
+    return len(missing)
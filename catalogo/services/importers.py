@@ -18,37 +18,75 @@ def _norm(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip().lower()
     return s
 
-def _pick(row: dict, colname: str):
-    """Obtiene row[colname] de forma tolerante a acentos, espacios, mayúsculas y recortes."""
+# Campos que el mapeo puede apuntar a una columna del archivo
+MAPPED_FIELDS = ("sku", "mpn", "gtin", "name", "brand", "socket", "price", "currency", "stock")
+
+
+def _resolve_column(normkeys: dict, colname: str):
+    """
+    Índice de la columna para colname, tolerante a acentos, espacios, mayúsculas y
+    recortes (None si no hay). normkeys: encabezado normalizado -> índice.
+    """
     if not colname:
-        return ""
+        return None
     norm_target = _norm(colname)
-    # mapa normalizado -> original
-    normkeys = { _norm(k): k for k in row.keys() }
+    if not norm_target:
+        return None
     # 1) match exacto normalizado
     if norm_target in normkeys:
-        return row.get(normkeys[norm_target], "")
+        return normkeys[norm_target]
     # 2) por prefijo (soporta encabezados recortados)
-    for nk, orig in normkeys.items():
+    for nk, idx in normkeys.items():
         if nk.startswith(norm_target) or norm_target.startswith(nk):
-            return row.get(orig, "")
-    return ""
+            return idx
+    return None
+
+
+def compile_mapping(headers, mapping: dict):
+    """
+    Resuelve el mapeo campo -> índice de columna una sola vez por archivo.
+    Devuelve (indices, sin_resolver): los campos mapeados cuya columna no existe.
+    """
+    normkeys = {}
+    for i, h in enumerate(headers):
+        nk = _norm(h)
+        if nk:  # celdas vacías (p. ej. formato al final de la fila) empatarían cualquier prefijo
+            normkeys[nk] = i  # con encabezados repetidos gana el último, como antes
+    indices, unresolved = {}, []
+    for field in MAPPED_FIELDS:
+        colname = mapping.get(field, "")
+        indices[field] = _resolve_column(normkeys, colname)
+        if colname and indices[field] is None:
+            unresolved.append(f"{field} ({colname})")
+    return indices, unresolved
+
+
+def _cell(row: tuple, idx):
+    if idx is None or idx >= len(row):
+        return ""
+    value = row[idx]
+    return "" if value is None else value
 
 def _rows_from_xlsx(path: str):
     wb = load_workbook(filename=path, read_only=True, data_only=True)
     ws = wb.active
-    headers = [str(c.value or "") for c in next(ws.iter_rows(min_row=1, max_row=1))]
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        yield dict(zip(headers, [r if r is not None else "" for r in row]))
+    rows = ws.iter_rows(values_only=True)
+    headers = [str(v or "") for v in next(rows, ())]
+    return headers, rows
 
 def _rows_from_csv(path: str):
     # utf-8-sig para tolerar BOM que agrega Excel al CSV
-    with open(path, newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            yield {k: (v or "") for k, v in row.items()}
+    f = open(path, newline="", encoding="utf-8-sig")
+    reader = csv.reader(f)
+    headers = next(reader, [])
+
+    def rows():
+        with f:
+            yield from reader
+    return headers, rows()
 
 def _iter_rows(path: str):
+    """(encabezados, iterador de filas como tuplas posicionales)."""
     ext = os.path.splitext(path)[1].lower()
     if ext == ".xlsx":
         return _rows_from_xlsx(path)
@@ -58,20 +96,27 @@ def _iter_rows(path: str):
 
 def import_for_supplier(supplier: Supplier, path: str, mapping: dict | None = None) -> ImportJob:
     mapping = mapping or supplier.config or DEFAULT_MAPPINGS.get(supplier.slug, {})
-    job = ImportJob.objects.create(supplier=supplier, filename=path)
+    headers, rows = _iter_rows(path)
+    cols, unresolved = compile_mapping(headers, mapping)
 
-    created_links = updated_links = created_products = 0
     notes = []  # para registrar filas saltadas u observaciones
+    if unresolved:
+        notes.append("Campos del mapeo sin columna en el archivo: " + ", ".join(unresolved))
+    # Se reporta desde el inicio, antes de procesar filas
+    job = ImportJob.objects.create(supplier=supplier, filename=path, notes="\n".join(notes))
+
+    created_links = updated_links = created_products = 0
 
-    for row in _iter_rows(path):
-        sku     = str(_pick(row, mapping.get("sku", ""))).strip()
-        mpn     = str(_pick(row, mapping.get("mpn", ""))).strip()
-        gtin    = str(_pick(row, mapping.get("gtin", ""))).strip()
-        name    = str(_pick(row, mapping.get("name", ""))).strip()
-        brand   = str(_pick(row, mapping.get("brand", ""))).strip()
-        socket  = str(_pick(row, mapping.get("socket", ""))).strip()
-        price_raw = _pick(row, mapping.get("price", "")) or 0
-        currency  = str(_pick(row, mapping.get("currency", "")) or "MXN").strip() or "MXN"
+    for row in rows:
+        sku     = str(_cell(row, cols["sku"])).strip()
+        mpn     = str(_cell(row, cols["mpn"])).strip()
+        gtin    = str(_cell(row, cols["gtin"])).strip()
+        name    = str(_cell(row, cols["name"])).strip()
+        brand   = str(_cell(row, cols["brand"])).strip()
+        socket  = str(_cell(row, cols["socket"])).strip()
+        price_raw = _cell(row, cols["price"]) or 0
+        currency  = str(_cell(row, cols["currency"]) or "MXN").strip() or "MXN"
+        stock_raw = _cell(row, cols["stock"]) or 0
                 # Normalización precio/stock
         try:
             price = Decimal(str(price_raw).replace(",", "")).quantize(Decimal("0.01"))
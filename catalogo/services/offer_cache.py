@@ -0,0 +1,186 @@
+"""
+Caché versionada de ofertas por producto (framework de caché de Django).
+
+Cada proveedor tiene un número de generación en la caché. La llave de un
+producto incluye la huella de las generaciones de todos los proveedores, así
+que al importar basta con subir la generación del proveedor (un incr) para
+que todas las entradas viejas dejen de leerse, sin recorrer llaves; caducan
+solas por OFFER_CACHE_TIMEOUT o las desaloja el backend.
+
+La invalidación solo cruza procesos si el backend es compartido (archivo,
+memcached, redis...). Con LocMemCache las entradas se limitan a
+OFFER_CACHE_LOCMEM_TIMEOUT segundos.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from catalogo.models import Supplier, SupplierProduct
+
+PREFIX = "offers"
+SUPPLIERS_KEY = f"{PREFIX}:suppliers"
+HITS_KEY = f"{PREFIX}:stats:hits"
+MISSES_KEY = f"{PREFIX}:stats:misses"
+
+
+def _cache():
+    return caches[getattr(settings, "OFFER_CACHE_ALIAS", "default")]
+
+
+def _timeout() -> int:
+    timeout = int(getattr(settings, "OFFER_CACHE_TIMEOUT", 60 * 60 * 24))
+    if isinstance(_cache(), LocMemCache):
+        # Generaciones por proceso: otro proceso que importe no las sube aquí
+        timeout = min(timeout, int(getattr(settings, "OFFER_CACHE_LOCMEM_TIMEOUT", 60)))
+    return timeout
+
+
+def _gen_key(supplier_id: int) -> str:
+    return f"{PREFIX}:gen:{supplier_id}"
+
+
+def _new_generation() -> int:
+    # Si la generación se pierde (desalojo/reinicio) no debe volver a un valor ya usado
+    return time.time_ns()
+
+
+def _incr_forever(cache, key: str, delta: int, initial) -> None:
+    """
+    incr que no caduca. Los backends sin incr nativo (archivo, base de datos)
+    lo hacen con get + set y el set usa el TIMEOUT por defecto: touch(None)
+    devuelve la llave a "sin caducidad".
+    """
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, initial, None):
+            return
+        cache.incr(key, delta)
+    cache.touch(key, None)
+
+
+def _bump_now(supplier_ids: Iterable[int]) -> None:
+    cache = _cache()
+    for sid in set(supplier_ids):
+        _incr_forever(cache, _gen_key(sid), 1, _new_generation())
+
+
+def bump_supplier_generation(*supplier_ids: int) -> None:
+    """
+    Invalida en O(1) todas las ofertas cacheadas de los proveedores dados.
+    Se aplica al confirmar la transacción, para que nadie cachee datos previos
+    con la generación nueva.
+    """
+    ids = [sid for sid in supplier_ids if sid is not None]
+    if ids:
+        transaction.on_commit(lambda: _bump_now(ids))
+
+
+def forget_suppliers() -> None:
+    """La lista de proveedores cambió (alta/baja): se relee en la siguiente consulta."""
+    transaction.on_commit(lambda: _cache().delete(SUPPLIERS_KEY))
+
+
+def _version() -> str:
+    """Huella de las generaciones de todos los proveedores (dos lecturas de caché)."""
+    cache = _cache()
+    supplier_ids = cache.get(SUPPLIERS_KEY)
+    if supplier_ids is None:
+        supplier_ids = sorted(Supplier.objects.values_list("pk", flat=True))
+        cache.set(SUPPLIERS_KEY, supplier_ids, None)
+    gens = cache.get_many([_gen_key(sid) for sid in supplier_ids])
+    missing = {_gen_key(sid): _new_generation() for sid in supplier_ids if _gen_key(sid) not in gens}
+    if missing:
+        for key, value in missing.items():
+            # add: si otro proceso ya la creó, se respeta la suya
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+            gens[key] = value
+    token = ",".join(f"{sid}.{gens[_gen_key(sid)]}" for sid in supplier_ids)
+    return hashlib.md5(token.encode("ascii")).hexdigest()[:16]
+
+
+def _count(key: str, n: int) -> None:
+    if n:
+        _incr_forever(_cache(), key, n, n)
+
+
+def _load_offers(product_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    result: Dict[int, List[Dict[str, Any]]] = {pid: [] for pid in product_ids}
+    rows = (
+        SupplierProduct.objects
+        .filter(product_id__in=product_ids, is_active=True)
+        .order_by("price", "supplier__name")
+        .values("product_id", "supplier_id", "supplier__name", "identifier_value", "price", "stock", "last_seen")
+    )
+    for r in rows:
+        result[r.pop("product_id")].append({
+            "supplier_id": r["supplier_id"],
+            "supplier": r["supplier__name"],
+            "identifier_value": r["identifier_value"],
+            "price": r["price"],
+            "stock": r["stock"],
+            "last_seen": r["last_seen"],
+        })
+    return result
+
+
+def get_offers_for_products(product_ids: Iterable[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Ofertas activas (más baratas primero) de varios productos: un get_many y una consulta para los faltantes."""
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return {}
+    cache = _cache()
+    version = _version()
+    keys = {pid: f"{PREFIX}:{version}:{pid}" for pid in product_ids}
+    cached = cache.get_many(keys.values())
+    result = {pid: cached[key] for pid, key in keys.items() if key in cached}
+    missing = [pid for pid in product_ids if pid not in result]
+    _count(HITS_KEY, len(result))
+    _count(MISSES_KEY, len(missing))
+    if missing:
+        loaded = _load_offers(missing)
+        cache.set_many({keys[pid]: offers for pid, offers in loaded.items()}, _timeout())
+        result.update(loaded)
+    return result
+
+
+def get_product_offers(product_id: int) -> List[Dict[str, Any]]:
+    """Ofertas activas del producto, más baratas primero."""
+    return get_offers_for_products([product_id])[product_id]
+
+
+def best_offer(offers: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    La más barata con stock; si ninguna tiene, la más barata (offers ya viene
+    ordenada por precio). Un precio <= 0 es un precio faltante y nunca gana.
+    """
+    priced = [o for o in offers if o["price"] > 0]
+    return next((o for o in priced if o["stock"] > 0), priced[0] if priced else None)
+
+
+def get_best_offer(product_id: int) -> Optional[Dict[str, Any]]:
+    return best_offer(get_product_offers(product_id))
+
+
+def get_best_offers(product_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    return {pid: best_offer(offers) for pid, offers in get_offers_for_products(product_ids).items()}
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Contadores de aciertos/fallos (compartidos si el backend lo es: archivo, memcached, ...)."""
+    got = _cache().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = got.get(HITS_KEY, 0), got.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": (hits / total) if total else 0.0}
+
+
+def reset_stats() -> None:
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
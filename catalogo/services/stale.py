@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Max
+
+from catalogo.models import Supplier, SupplierProduct, ImportJob
+from .offer_cache import bump_supplier_generation
+
+
+def stale_grace() -> timedelta:
+    """Periodo de gracia (settings.STALE_OFFER_GRACE_HOURS) antes de dar por muerta una oferta."""
+    return timedelta(hours=float(getattr(settings, "STALE_OFFER_GRACE_HOURS", 0)))
+
+
+def sweep_stale_offers(supplier: Supplier, run_started_at: datetime, grace: Optional[timedelta] = None) -> int:
+    """
+    Desactiva (stock=0, is_active=False) los vínculos del proveedor que no
+    aparecieron en la corrida actual, es decir, con last_seen anterior a
+    run_started_at - grace. Es un solo UPDATE apoyado en el índice
+    (supplier, last_seen); devuelve cuántas filas cambió.
+    """
+    if grace is None:
+        grace = stale_grace()
+    cutoff = run_started_at - grace
+    swept = (
+        SupplierProduct.objects
+        .filter(supplier=supplier, last_seen__lt=cutoff, is_active=True)
+        .update(stock=0, is_active=False)
+    )
+    if swept:
+        bump_supplier_generation(supplier.pk)
+    return swept
+
+
+def stale_cutoffs(supplier_ids: Iterable[int], grace: Optional[timedelta] = None) -> Dict[int, datetime]:
+    """
+    {supplier_id: corte} con el mismo criterio que sweep_stale_offers: inicio de
+    la última importación terminada del proveedor menos grace. Lo visto antes del
+    corte ya no está en el catálogo vigente. Sin importaciones no hay corte.
+    """
+    if grace is None:
+        grace = stale_grace()
+    last_runs = (
+        ImportJob.objects
+        .filter(supplier_id__in=list(supplier_ids), finished_at__isnull=False)
+        .values("supplier_id")
+        .annotate(last_start=Max("started_at"))
+    )
+    return {r["supplier_id"]: r["last_start"] - grace for r in last_runs}
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from catalogo.models import Supplier, ProductIdentifier, SupplierProduct, UnmatchedIdentifier
+from .stale import stale_cutoffs
+
+# Lotes para los IN (...) y bulk_*: SQLite limita el número de parámetros
+CHUNK = 500
+
+
+def normalize_identifier(value: str) -> str:
+    """Misma normalización que usa el empate del upload: mayúsculas y sin espacios."""
+    return str(value or "").strip().upper().replace(" ", "")
+
+
+def _chunks(seq, size=CHUNK):
+    seq = list(seq)
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def queue_unmatched(supplier: Supplier, entries: Dict[str, Tuple[float, int, int]], seen_at: datetime = None,
+                    run_hash: str = "") -> int:
+    """
+    Guarda/actualiza la cola de identificadores sin coincidencia del proveedor.
+    entries: {identifier_value: (ultimo_precio, ultimo_stock, ocurrencias_en_este_archivo)}
+    run_hash: huella de la corrida; si ya fue la última en sumar ocurrencias a una
+    entrada (--force, archivo repetido) solo se refrescan precio, stock y last_seen.
+    Devuelve cuántos identificadores quedaron en cola desde este archivo.
+    """
+    if not entries:
+        return 0
+    seen_at = seen_at or timezone.now()
+
+    for keys in _chunks(entries.keys()):
+        existing = {
+            q.identifier_value: q
+            for q in UnmatchedIdentifier.objects.filter(supplier=supplier, identifier_value__in=keys)
+        }
+        to_update, to_create = [], []
+        for ident in keys:
+            price, stock, count = entries[ident]
+            q = existing.get(ident)
+            if q is None:
+                to_create.append(UnmatchedIdentifier(
+                    supplier=supplier,
+                    identifier_value=ident,
+                    normalized_value=normalize_identifier(ident),
+                    occurrences=count,
+                    last_price=Decimal(str(round(price, 2))),
+                    last_stock=stock,
+                    first_seen=seen_at,
+                    last_seen=seen_at,
+                    counted_hash=run_hash,
+                ))
+            else:
+                if not run_hash or q.counted_hash != run_hash:
+                    q.occurrences += count
+                    q.counted_hash = run_hash
+                q.last_price = Decimal(str(round(price, 2)))
+                q.last_stock = stock
+                q.last_seen = seen_at
+                to_update.append(q)
+        if to_create:
+            UnmatchedIdentifier.objects.bulk_create(to_create)
+        if to_update:
+            UnmatchedIdentifier.objects.bulk_update(
+                to_update, ["occurrences", "counted_hash", "last_price", "last_stock", "last_seen"]
+            )
+    return len(entries)
+
+
+def drop_matched(supplier: Supplier, identifiers: Iterable[str]) -> int:
+    """Saca de la cola del proveedor los identificadores que ya empataron. Devuelve cuántos borró."""
+    dropped = 0
+    for keys in _chunks(set(identifiers)):
+        dropped += UnmatchedIdentifier.objects.filter(supplier=supplier, identifier_value__in=keys).delete()[0]
+    return dropped
+
+
+@transaction.atomic
+def promote_queued(values: Iterable[str]) -> int:
+    """
+    Re-resuelve solo las entradas de la cola afectadas por los valores de
+    ProductIdentifier dados (p. ej. recién creados) y las convierte en
+    SupplierProduct con el último precio/stock visto. Las que no aparecieron en
+    la última importación del proveedor (stale_cutoffs) entran inactivas y con
+    stock 0, como las que desactiva sweep_stale_offers. Un vínculo que ya existe y
+    se vio en o después de la entrada no se toca: la cola es más vieja que él.
+    Devuelve cuántas promovió.
+    """
+    values = {str(v).strip() for v in values if v}
+    if not values:
+        return 0
+    if len(values) > CHUNK:
+        # Carga masiva: la cola suele ser mucho más chica que los valores nuevos;
+        # se cruza en memoria en vez de lanzar un IN (...) por cada bloque de valores
+        queued = set(UnmatchedIdentifier.objects.values_list("normalized_value", flat=True).distinct())
+        values = {v for v in values if normalize_identifier(v) in queued}
+
+    promoted = 0
+    for chunk in _chunks(values):
+        id_map = dict(ProductIdentifier.objects.filter(value__in=chunk).values_list("value", "product_id"))
+        if not id_map:
+            continue
+        id_map_norm = {normalize_identifier(k): v for k, v in id_map.items()}
+
+        done, superseded = [], []
+        queued = list(UnmatchedIdentifier.objects.filter(normalized_value__in=list(id_map_norm)))
+        cutoffs = stale_cutoffs({q.supplier_id for q in queued})
+        linked_seen = {
+            (sid, ident): seen
+            for sid, ident, seen in SupplierProduct.objects
+            .filter(identifier_value__in=[q.identifier_value for q in queued])
+            .values_list("supplier_id", "identifier_value", "last_seen")
+        }
+        for q in queued:
+            seen = linked_seen.get((q.supplier_id, q.identifier_value))
+            if seen is not None and seen >= q.last_seen:
+                superseded.append(q.pk)
+                continue
+            # Empate exacto primero y luego normalizado, igual que en el upload
+            product_id = id_map.get(q.identifier_value) or id_map_norm.get(q.normalized_value)
+            cutoff = cutoffs.get(q.supplier_id)
+            stale = cutoff is not None and q.last_seen < cutoff
+            SupplierProduct.objects.update_or_create(
+                supplier_id=q.supplier_id,
+                identifier_value=q.identifier_value,
+                defaults={
+                    "product_id": product_id,
+                    "price": q.last_price,
+                    "stock": 0 if stale else q.last_stock,
+                    "last_seen": q.last_seen,
+                    "is_active": not stale,
+                },
+            )
+            done.append(q.pk)
+        if done or superseded:
+            UnmatchedIdentifier.objects.filter(pk__in=done + superseded).delete()
+            promoted += len(done)
+    return promoted
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ProductIdentifier, Supplier, SupplierProduct
+from .services.offer_cache import bump_supplier_generation, forget_suppliers
+
+
+@receiver(post_save, sender=ProductIdentifier)
+def promote_unmatched_on_new_identifier(sender, instance, **kwargs):
+    """Al dar de alta/editar un identificador, promueve lo que estaba en cola con ese valor."""
+    from .services.unmatched import promote_queued
+    value = instance.value
+    transaction.on_commit(lambda: promote_queued([value]))
+
+
+@receiver([post_save, post_delete], sender=SupplierProduct)
+def invalidate_offers_on_change(sender, instance, **kwargs):
+    """Ediciones sueltas (admin, promoción de la cola): invalida la caché del proveedor."""
+    bump_supplier_generation(instance.supplier_id)
+
+
+@receiver([post_save, post_delete], sender=Supplier)
+def invalidate_offers_on_supplier_change(sender, instance, **kwargs):
+    """Alta, baja o cambio de nombre de un proveedor."""
+    forget_suppliers()
+    bump_supplier_generation(instance.pk)
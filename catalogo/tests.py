@@ -1,3 +1,528 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Supplier, Product, ProductIdentifier, SupplierProduct, UnmatchedIdentifier, ImportJob
+from .services import catalog_import, dedupe, offer_cache
+from .services.unmatched import promote_queued, queue_unmatched
+from .services.identifiers import gtin_checksum_ok, load_identifiers
+from .services.export import iter_price_list
+from .services.importers import compile_mapping
+from .utils.parsers import (
+    RecordBatch, _join_cell, consolidate_batches, consolidation_policy_for, parse_catalog_xlsx_batches,
+)
+from .views import PREVIEW_DIR
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                       "LOCATION": "catalogo-tests"}})
+class CatalogoTestCase(TestCase):
+    """Caché en memoria: las pruebas no comparten generaciones ni contadores con el servidor de desarrollo."""
+
+    def setUp(self):
+        super().setUp()
+        offer_cache._cache().clear()
+
+
+def _batch(source, offset, rows):
+    """RecordBatch a partir de [(identificador, precio, stock), ...]."""
+    return RecordBatch(
+        source, offset,
+        [r[0] for r in rows],
+        np.array([r[1] for r in rows], dtype=np.float64),
+        np.array([r[2] for r in rows], dtype=np.int64),
+    )
+
+
+class CatalogImportCheckpointTests(CatalogoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.supplier = Supplier.objects.create(name="Proveedor T")
+        for i in range(1, 5):
+            p = Product.objects.create(name=f"P{i}")
+            ProductIdentifier.objects.create(product=p, id_type=ProductIdentifier.MPN, value=f"ZZ-000{i}")
+        self.batches = [
+            _batch("Hoja1", 0, [("ZZ-0001", 10, 1), ("ZZ-0002", 20, 2)]),
+            _batch("Hoja1", 2, [("ZZ-0003", 30, 3), ("NO-EXISTE", 5, 1)]),
+        ]
+
+    def run_import(self, data=b"X", batches=None, **kwargs):
+        batches = self.batches if batches is None else batches
+        with mock.patch.object(catalog_import, "parse_catalog_batches", return_value=list(batches)):
+            return catalog_import.run_catalog_import(self.supplier, "x.xlsx", data, **kwargs)
+
+    def test_resume_from_checkpoint_after_crash(self):
+        real_write = catalog_import.write_offer_batch
+        calls = []
+
+        def dies_on_second_batch(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("worker murió")
+            return real_write(*args, **kwargs)
+
+        with mock.patch.object(catalog_import, "write_offer_batch", side_effect=dies_on_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        job = ImportJob.objects.get()
+        self.assertEqual((job.cursor_source, job.cursor_offset, job.processed_rows), ("Hoja1", 0, 2))
+        self.assertIsNone(job.finished_at)
+        self.assertEqual(SupplierProduct.objects.count(), 2)
+
+        resumed, state = self.run_import()
+        self.assertEqual(state, "reanudado")
+        self.assertEqual(resumed.pk, job.pk)
+        self.assertEqual((resumed.processed_rows, resumed.created_links, resumed.unmatched_rows), (4, 3, 1))
+        self.assertEqual(SupplierProduct.objects.count(), 3)
+        self.assertEqual(UnmatchedIdentifier.objects.get().occurrences, 1)
+
+    def test_matched_identifiers_leave_the_queue(self):
+        # Quedó en cola en una corrida anterior y se registró después
+        queue_unmatched(self.supplier, {"ZZ-0001": (1.0, 0, 1)}, seen_at=timezone.now() - timedelta(days=1))
+        self.run_import()
+        self.assertEqual(
+            list(UnmatchedIdentifier.objects.values_list("identifier_value", flat=True)), ["NO-EXISTE"]
+        )
+
+    def test_partial_run_does_not_sweep(self):
+        self.run_import(b"X")
+        skipped_batches = [_batch("Hoja1", 0, [("ZZ-0001", 11, 1)])]
+
+        def parser(*args, skipped, **kwargs):
+            skipped.append("Hoja2: no se pudo encontrar encabezado útil")
+            return list(skipped_batches)
+
+        with mock.patch.object(catalog_import, "parse_catalog_batches", side_effect=parser):
+            job, _ = catalog_import.run_catalog_import(self.supplier, "x.xlsx", b"Y")
+        self.assertEqual(job.stale_rows, 0)
+        self.assertIn("Hoja2", job.notes)
+        self.assertTrue(SupplierProduct.objects.get(identifier_value="ZZ-0002").is_active)
+
+    def test_unknown_cursor_abandons_job_and_starts_over(self):
+        old = ImportJob.objects.create(
+            supplier=self.supplier, filename="x.xlsx", cursor_source="Hoja9", cursor_offset=0,
+            file_hash=catalog_import.import_fingerprint(
+                b"X", usd_mxn_rate=18.5, policy=consolidation_policy_for(self.supplier.name)),
+        )
+        job, state = self.run_import()
+        self.assertEqual(state, "importado")
+        self.assertNotEqual(job.pk, old.pk)
+        self.assertEqual((job.processed_rows, job.created_links), (4, 3))
+        old.refresh_from_db()
+        self.assertIsNotNone(old.abandoned_at)
+        self.assertIsNone(old.finished_at)
+
+    def test_rerun_does_not_recount_unmatched(self):
+        self.run_import(b"X")
+        self.run_import(b"X", force=True)
+        self.run_import(b"Y", batches=[_batch("Hoja1", 0, [("ZZ-0001", 11, 1)])])
+        self.run_import(b"X")
+        self.assertEqual(UnmatchedIdentifier.objects.get().occurrences, 1)
+
+    def test_replay_is_idempotent(self):
+        self.run_import()
+        job, state = self.run_import()
+        self.assertEqual(state, "omitido")
+
+        job, state = self.run_import(force=True)
+        self.assertEqual(state, "importado")
+        self.assertEqual((job.created_links, job.updated_links), (0, 3))
+        self.assertEqual(SupplierProduct.objects.count(), 3)
+
+    def test_older_file_uploaded_again_is_imported(self):
+        self.run_import(b"X")
+        self.run_import(b"Y", batches=[_batch("Hoja1", 0, [("ZZ-0001", 11, 1)])])
+        self.assertFalse(SupplierProduct.objects.get(identifier_value="ZZ-0002").is_active)
+
+        job, state = self.run_import(b"X")
+        self.assertEqual(state, "importado")
+        self.assertTrue(SupplierProduct.objects.get(identifier_value="ZZ-0002").is_active)
+
+    def test_rate_change_is_not_skipped(self):
+        self.run_import()
+        with self.settings(USD_MXN_RATE=20.0):
+            job, state = self.run_import()
+        self.assertEqual(state, "importado")
+
+    def test_stale_unfinished_job_is_not_resumed(self):
+        old = ImportJob.objects.create(
+            supplier=self.supplier, filename="x.xlsx", cursor_source="Hoja1", cursor_offset=0,
+            file_hash=catalog_import.import_fingerprint(
+                b"X", usd_mxn_rate=18.5, policy=consolidation_policy_for(self.supplier.name)),
+            started_at=timezone.now() - timedelta(days=3),
+        )
+        job, state = self.run_import()
+        self.assertEqual(state, "importado")
+        self.assertNotEqual(job.pk, old.pk)
+        self.assertEqual(job.processed_rows, 4)
+
+
+class ConsolidateBatchesTests(CatalogoTestCase):
+    def consolidate(self, price):
+        batches = [
+            _batch("S1", 0, [("A", 0, 1), ("B", 0, 1), ("C", 5, 1)]),
+            _batch("S2", 0, [("A", 12, 2), ("B", 0, 2), ("A", 10, 3)]),
+        ]
+        out, collapsed = consolidate_batches(batches, price=price, stock="sum")
+        self.assertEqual(collapsed, 3)
+        return {i: (p, s) for b in out for i, p, s in zip(b.identifiers, b.prices.tolist(), b.stocks.tolist())}
+
+    def test_missing_prices_do_not_win(self):
+        self.assertEqual(self.consolidate("min"), {"A": (10, 6), "B": (0, 3), "C": (5, 1)})
+        self.assertEqual(self.consolidate("max")["A"], (12, 6))
+        self.assertEqual(self.consolidate("first")["A"], (12, 6))
+
+
+class PromoteQueuedTests(CatalogoTestCase):
+    def test_entries_missing_from_last_import_are_promoted_inactive(self):
+        supplier = Supplier.objects.create(name="Proveedor T")
+        job = ImportJob.objects.create(supplier=supplier, filename="x.xlsx", finished_at=timezone.now())
+        queue_unmatched(supplier, {"VIEJO-1": (10.0, 5, 1)}, seen_at=job.started_at - timedelta(days=2))
+        queue_unmatched(supplier, {"NUEVO-1": (20.0, 7, 1)}, seen_at=job.started_at)
+
+        product = Product.objects.create(name="P1")
+        with self.captureOnCommitCallbacks(execute=True):
+            for value in ("VIEJO-1", "NUEVO-1"):
+                ProductIdentifier.objects.create(product=product, id_type=ProductIdentifier.MPN, value=value)
+
+        self.assertEqual(
+            set(SupplierProduct.objects.values_list("identifier_value", "stock", "is_active")),
+            {("VIEJO-1", 0, False), ("NUEVO-1", 7, True)},
+        )
+        self.assertFalse(UnmatchedIdentifier.objects.exists())
+
+
+    def test_queue_older_than_live_offer_is_discarded(self):
+        supplier = Supplier.objects.create(name="Proveedor T")
+        product = Product.objects.create(name="P1")
+        ProductIdentifier.objects.create(product=product, id_type=ProductIdentifier.MPN, value="X-100")
+        now = timezone.now()
+        queue_unmatched(supplier, {"X-100": (10.0, 0, 1)}, seen_at=now - timedelta(hours=1))
+        SupplierProduct.objects.create(product=product, supplier=supplier, identifier_value="X-100",
+                                       price=20, stock=9, last_seen=now)
+
+        self.assertEqual(promote_queued(["X-100"]), 0)
+        self.assertEqual(
+            SupplierProduct.objects.values_list("price", "stock", "is_active").get(),
+            (20, 9, True),
+        )
+        self.assertFalse(UnmatchedIdentifier.objects.exists())
+
+
+class XlsxSkippedSheetsTests(CatalogoTestCase):
+    def test_unreadable_sheets_are_reported_and_empty_ones_ignored(self):
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf) as writer:
+            pd.DataFrame({"sku": ["ZZ-0001"], "precio": [10], "stock": [1]}).to_excel(writer, sheet_name="S1", index=False)
+            pd.DataFrame({"foo": ["a"], "bar": ["b"]}).to_excel(writer, sheet_name="Rara", index=False)
+            pd.DataFrame().to_excel(writer, sheet_name="Portada", index=False)
+        skipped = []
+        batches = list(parse_catalog_xlsx_batches("Proveedor Nuevo", buf.getvalue(), skipped=skipped))
+        self.assertEqual([b.identifiers for b in batches], [["ZZ-0001"]])
+        self.assertEqual(len(skipped), 1)
+        self.assertTrue(skipped[0].startswith("Rara: "))
+
+
+class PdfCellJoinTests(CatalogoTestCase):
+    # (top, x0, x1, texto); la celda del modelo termina en x=88, ~4.4 pt por carácter
+    BROKEN = [(10, 15, 86.3, "TUF-RTX5070-O12G-GA"), (16, 15, 34, "MING")]
+    WRAPPED = [(10, 15, 40, "GX601"), (10, 42, 60, "ROG"), (16, 15, 45, "HELIOS")]
+
+    def test_identifier_lines_are_rejoined(self):
+        self.assertEqual(_join_cell(self.BROKEN, right=88), "TUF-RTX5070-O12G-GAMING")
+        self.assertEqual(_join_cell(self.WRAPPED, right=88), "GX601 ROG HELIOS")
+
+    def test_other_columns_keep_line_breaks(self):
+        self.assertEqual(_join_cell(self.WRAPPED), "GX601 ROG\nHELIOS")
+
+
+class PreviewConfirmTests(CatalogoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user("operador"))
+        self.supplier = Supplier.objects.create(name="Proveedor Nuevo")
+        for value in ("ZZ-0001", "ZZ-0002"):
+            ProductIdentifier.objects.create(
+                product=Product.objects.create(name=value), id_type=ProductIdentifier.MPN, value=value
+            )
+
+    def workbook(self):
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf) as writer:
+            pd.DataFrame({"sku": ["ZZ-0001"], "precio": [10], "stock": [1]}).to_excel(writer, sheet_name="S1", index=False)
+            pd.DataFrame({"modelo": ["ZZ-0002"], "costo": [20], "existencia": [2]}).to_excel(writer, sheet_name="S2", index=False)
+        return buf.getvalue()
+
+    def preview(self):
+        response = self.client.post("/catalogo/upload/", {
+            "supplier": self.supplier.pk, "action": "preview",
+            "file": SimpleUploadedFile("lista.xlsx", self.workbook()),
+        })
+        return response.context["preview_token"]
+
+    def test_confirm_keeps_mapping_of_every_sheet(self):
+        token = self.preview()
+        self.assertEqual(set(self.client.session["catalog_preview"]["column_map"]), {"S1", "S2"})
+        self.client.post("/catalogo/upload/", {"action": "confirm", "preview_token": token})
+        self.assertEqual(
+            set(SupplierProduct.objects.values_list("identifier_value", "price", "stock")),
+            {("ZZ-0001", 10, 1), ("ZZ-0002", 20, 2)},
+        )
+        self.assertFalse(os.path.exists(os.path.join(PREVIEW_DIR, token)))
+
+    def test_preview_file_removed_when_import_fails(self):
+        token = self.preview()
+        with mock.patch("catalogo.views.run_catalog_import", side_effect=RuntimeError("falló")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/catalogo/upload/", {"action": "confirm", "preview_token": token})
+        self.assertFalse(os.path.exists(os.path.join(PREVIEW_DIR, token)))
+
+    def test_expired_preview_is_rejected(self):
+        token = self.preview()
+        with self.settings(CATALOG_PREVIEW_MAX_HOURS=0):
+            self.client.post("/catalogo/upload/", {"action": "confirm", "preview_token": token})
+        self.assertFalse(SupplierProduct.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(PREVIEW_DIR, token)))
+
+
+class DedupeTests(CatalogoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.supplier = Supplier.objects.create(name="Proveedor T")
+        self.p = {}
+        for name, id_type, value in [
+            ("A", ProductIdentifier.MPN, "AB-1234"),
+            ("A2", ProductIdentifier.MPN, "ab-1234 "),            # mismo MPN normalizado
+            ("G", ProductIdentifier.UPC_EAN, "036000291452"),
+            ("G2", ProductIdentifier.UPC_EAN, "00036000291452"),  # mismo GTIN a 14 dígitos
+            ("C", ProductIdentifier.MPN, "CHAIN-01"),
+            ("C2", ProductIdentifier.MPN, "CHAIN-02"),
+            ("C3", ProductIdentifier.MPN, "chain-02"),
+            ("S", ProductIdentifier.SKU_ALT, "X-100"),
+            ("S2", ProductIdentifier.MPN, "OTRO-9"),
+        ]:
+            self.p[name] = Product.objects.create(name=name)
+            ProductIdentifier.objects.create(product=self.p[name], id_type=id_type, value=value)
+        # C2 también se vende con la clave de C: une la cadena C - C2 - C3
+        SupplierProduct.objects.create(product=self.p["C2"], supplier=self.supplier, identifier_value="CHAIN-01",
+                                       price=1, stock=1)
+        # "X-100" parece MPN pero está registrado como SKU alterno: no une S con S2
+        other = Supplier.objects.create(name="Proveedor U")
+        SupplierProduct.objects.create(product=self.p["S"], supplier=self.supplier, identifier_value="X-100",
+                                       price=1, stock=1)
+        SupplierProduct.objects.create(product=self.p["S2"], supplier=other, identifier_value="X-100",
+                                       price=1, stock=1)
+
+    def pks(self, *names):
+        return [self.p[n].pk for n in names]
+
+    def test_groups(self):
+        groups, edges = dedupe.find_duplicate_groups()
+        self.assertEqual(edges, 9)
+        self.assertEqual(groups, {
+            self.p["A"].pk: self.pks("A2"),
+            self.p["G"].pk: self.pks("G2"),
+            self.p["C"].pk: self.pks("C2", "C3"),
+        })
+
+    def test_merge_moves_rows_to_canonical(self):
+        with mock.patch.object(dedupe, "REASSIGN_CHUNK", 2), self.captureOnCommitCallbacks(execute=True):
+            stats = dedupe.merge_duplicate_products()
+        self.assertEqual((stats["duplicates"], stats["identifiers_moved"], stats["links_moved"]), (4, 4, 1))
+        self.assertFalse(Product.objects.filter(pk__in=self.pks("A2", "G2", "C2", "C3")).exists())
+        self.assertEqual(
+            set(ProductIdentifier.objects.filter(product=self.p["C"]).values_list("value", flat=True)),
+            {"CHAIN-01", "CHAIN-02", "chain-02"},
+        )
+        self.assertEqual(SupplierProduct.objects.get(identifier_value="CHAIN-01").product, self.p["C"])
+        self.assertEqual(SupplierProduct.objects.get(supplier__name="Proveedor U").product, self.p["S2"])
+
+    def test_dry_run_writes_nothing(self):
+        stats = dedupe.merge_duplicate_products(dry_run=True)
+        self.assertEqual((stats["groups"], stats["identifiers_moved"], stats["links_moved"]), (3, 4, 1))
+        self.assertEqual(Product.objects.count(), 9)
+
+
+class CompileMappingTests(CatalogoTestCase):
+    def test_exact_and_prefix(self):
+        cols, unresolved = compile_mapping(
+            ["SKU", "Precio Público", "Existencia"], {"sku": "sku", "price": "precio publico", "stock": "existencias"}
+        )
+        self.assertEqual((cols["sku"], cols["price"], cols["stock"]), (0, 1, 2))
+        self.assertEqual(unresolved, [])
+
+    def test_duplicate_header_keeps_last(self):
+        cols, _ = compile_mapping(["SKU", "Precio", "Precio"], {"price": "precio"})
+        self.assertEqual(cols["price"], 2)
+
+    def test_unresolved_with_blank_headers(self):
+        cols, unresolved = compile_mapping(["SKU", "", "Precio", None], {"stock": "existencia", "gtin": "upc"})
+        self.assertEqual((cols["stock"], cols["gtin"]), (None, None))
+        self.assertEqual(unresolved, ["gtin (upc)", "stock (existencia)"])
+
+
+class PriceListExportTests(CatalogoTestCase):
+    def setUp(self):
+        super().setUp()
+        alfa = Supplier.objects.create(name="Alfa")
+        beta = Supplier.objects.create(name="Beta")
+        self.p = {name: Product.objects.create(name=name) for name in ("P1", "P2", "P3", "P4")}
+
+        def ident(name, id_type, value):
+            ProductIdentifier.objects.create(product=self.p[name], id_type=id_type, value=value)
+
+        def offer(name, supplier, value, price, stock, active=True):
+            SupplierProduct.objects.create(product=self.p[name], supplier=supplier, identifier_value=value,
+                                           price=price, stock=stock, is_active=active)
+
+        ident("P1", ProductIdentifier.MPN, "P1-MPN")
+        ident("P1", ProductIdentifier.UPC_EAN, "036000291452")
+        ident("P2", ProductIdentifier.MPN, "P2-MPN")  # sin ofertas: no sale ni se cuela en P3
+        ident("P3", ProductIdentifier.MPN, "P3-MPN")
+        offer("P1", alfa, "P1-MPN", 10, 2)
+        offer("P1", alfa, "P1-ALT", 8, 3)             # dos ofertas del mismo proveedor
+        offer("P1", beta, "P1-MPN", 0, 4)             # sin precio: no es la mejor
+        offer("P3", alfa, "P3-MPN", 3, 1, active=False)
+        offer("P3", beta, "P3-MPN", 5, 1)
+        offer("P4", beta, "P4-MPN", 7, 1, active=False)
+
+    def expected(self, include_inactive=False):
+        p1, p3, p4 = self.p["P1"].pk, self.p["P3"].pk, self.p["P4"].pk
+        rows = [
+            ["producto_id", "producto", "sku_base", "identificadores",
+             "Alfa precio", "Alfa stock", "Beta precio", "Beta stock", "mejor_precio", "mejor_proveedor"],
+            [p1, "P1", "", "MPN:P1-MPN|UPC_EAN:036000291452", 8, 5, 0, 4, 8, "Alfa"],
+        ]
+        if include_inactive:
+            rows += [[p3, "P3", "", "MPN:P3-MPN", 3, 1, 5, 1, 3, "Alfa"], [p4, "P4", "", "", "", "", 7, 1, 7, "Beta"]]
+        else:
+            rows += [[p3, "P3", "", "MPN:P3-MPN", "", "", 5, 1, 5, "Beta"]]
+        return rows
+
+    def test_pivot_and_identifier_merge(self):
+        self.assertEqual(list(iter_price_list(chunk_size=2)), self.expected())
+        self.assertEqual(list(iter_price_list(include_inactive=True)), self.expected(include_inactive=True))
+
+    def csv_lines(self, include_inactive=False):
+        p1, p3, p4 = self.p["P1"].pk, self.p["P3"].pk, self.p["P4"].pk
+        lines = [
+            "producto_id,producto,sku_base,identificadores,Alfa precio,Alfa stock,Beta precio,Beta stock,"
+            "mejor_precio,mejor_proveedor",
+            f"{p1},P1,,MPN:P1-MPN|UPC_EAN:036000291452,8.00,5,0.00,4,8.00,Alfa",
+        ]
+        if include_inactive:
+            lines += [f"{p3},P3,,MPN:P3-MPN,3.00,1,5.00,1,3.00,Alfa", f"{p4},P4,,,,,7.00,1,7.00,Beta"]
+        else:
+            lines += [f"{p3},P3,,MPN:P3-MPN,,,5.00,1,5.00,Beta"]
+        return lines
+
+    def test_csv_view(self):
+        self.client.force_login(User.objects.create_user("operador"))
+        response = self.client.get("/catalogo/export/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(body.splitlines(), self.csv_lines())
+
+    def test_command_output(self):
+        out = io.StringIO()
+        call_command("export_price_list", "--inactive", stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), self.csv_lines(include_inactive=True))
+
+
+class LoadIdentifiersTests(CatalogoTestCase):
+    def frame(self, rows):
+        return pd.DataFrame(rows, columns=["producto", "mpn", "upc"], dtype=str)
+
+    def test_gtin_checksum(self):
+        ok = gtin_checksum_ok(pd.Series(["036000291452", "4006381333931", "036000291453", "10012345678902"]))
+        self.assertEqual(ok.tolist(), [True, True, False, True])
+
+    def test_counts_and_dedupe(self):
+        ProductIdentifier.objects.create(
+            product=Product.objects.create(name="Viejo"), id_type=ProductIdentifier.MPN, value="BX-OLD"
+        )
+        df = self.frame([
+            ["Ryzen 5", "100-000000147", "036000291452"],
+            ["Ryzen 5", "100-000000147", ""],             # repetido en el archivo
+            ["Core i5", "BX-OLD", "036000291453"],        # ya en la BD + verificador inválido
+        ])
+        stats = load_identifiers(df)
+        self.assertEqual(
+            {k: stats[k] for k in ("identifiers", "invalid_gtin", "duplicates", "existing", "created", "created_products")},
+            {"identifiers": 5, "invalid_gtin": 1, "duplicates": 1, "existing": 1, "created": 2, "created_products": 1},
+        )
+        self.assertEqual(
+            set(ProductIdentifier.objects.filter(product__name="Ryzen 5").values_list("id_type", "value")),
+            {(ProductIdentifier.MPN, "100-000000147"), (ProductIdentifier.UPC_EAN, "036000291452")},
+        )
+
+    def test_dry_run_writes_nothing(self):
+        stats = load_identifiers(self.frame([["Ryzen 5", "100-000000147", "036000291452"]]), dry_run=True)
+        self.assertEqual(stats["created"], 2)
+        self.assertFalse(ProductIdentifier.objects.exists())
+
+
+class OfferCacheTests(CatalogoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.supplier = Supplier.objects.create(name="Proveedor T")
+        self.product = Product.objects.create(name="P1")
+        self.offer = SupplierProduct.objects.create(
+            product=self.product, supplier=self.supplier, identifier_value="ZZ-0001", price=10, stock=1
+        )
+
+    def test_generation_bump_invalidates(self):
+        self.assertEqual(offer_cache.get_best_offer(self.product.pk)["price"], 10)
+        # Escritura sin señales (como el upsert de la importación): la caché sigue sirviendo lo viejo
+        SupplierProduct.objects.filter(pk=self.offer.pk).update(price=7)
+        self.assertEqual(offer_cache.get_best_offer(self.product.pk)["price"], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            offer_cache.bump_supplier_generation(self.supplier.pk)
+        self.assertEqual(offer_cache.get_best_offer(self.product.pk)["price"], 7)
+        stats = offer_cache.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_best_offer_ignores_missing_prices(self):
+        other = Supplier.objects.create(name="Proveedor U")
+        SupplierProduct.objects.create(product=self.product, supplier=other, identifier_value="ZZ-0001",
+                                       price=0, stock=5)
+        self.assertEqual(offer_cache.get_best_offer(self.product.pk)["supplier"], "Proveedor T")
+        self.assertIsNone(offer_cache.best_offer([{"price": 0, "stock": 3}]))
+
+    def test_save_signal_bumps(self):
+        offer_cache.get_product_offers(self.product.pk)
+        self.offer.stock = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offer.save()
+        self.assertEqual(offer_cache.get_product_offers(self.product.pk)[0]["stock"], 0)
+
+    def test_counters_and_generations_do_not_expire_on_file_cache(self):
+        with tempfile.TemporaryDirectory() as tmp, self.settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp, "TIMEOUT": 300,
+        }}):
+            offer_cache.get_product_offers(self.product.pk)
+            offer_cache.get_product_offers(self.product.pk)
+            offer_cache._bump_now([self.supplier.pk])
+            offer_cache._bump_now([self.supplier.pk])
+            later = time.time() + 3600
+            with mock.patch("django.core.cache.backends.filebased.time.time", return_value=later):
+                stats = offer_cache.cache_stats()
+                self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+                self.assertIsNotNone(offer_cache._cache().get(offer_cache._gen_key(self.supplier.pk)))
+
+    def test_locmem_timeout_is_short(self):
+        self.assertEqual(offer_cache._timeout(), 60)
+        with self.settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            self.assertEqual(offer_cache._timeout(), 60 * 60 * 24)
@@ -5,4 +5,5 @@ app_name = "catalogo"
 
 urlpatterns = [
     path("upload/", views.upload_catalog, name="upload"),
+    path("export/", views.export_price_list, name="export"),
 ]
@@ -1,14 +1,17 @@
 import io
 import re
-from typing import Iterable, Dict, Any, Optional
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Dict, Any, List, Optional
 
+import numpy as np
 import pandas as pd
-import pdfplumber
 
 # ========= Reglas y utilidades =========
 RE_UPC_EAN = re.compile(r"^\d{12,14}$")   # 12–14 dígitos = UPC/EAN
 NUM_RE = re.compile(r"[^0-9.,-]")         # limpia caracteres no numéricos
 PDF_HEADER_KEYS = ("modelo", "precio", "existencia", "disponible", "stock", "descripcion", "descripción")
+PDF_ANCHOR_KEYS = ("moneda", "currency", "precio")  # columna con un valor por registro (modo plantilla)
 
 
 def normalize_header(col: str) -> str:
@@ -62,6 +65,10 @@ def infer_id_type(raw: str) -> str:
         return ProductIdentifier.MPN
     return ProductIdentifier.SKU_ALT
 
+USD_ALIASES = {"USD", "US$", "DOLARES", "DÓLARES", "DOLARES USD", "DÓLARES USD"}
+MXN_ALIASES = {"MXN", "MEX", "PESOS", "PESOS MXN", "MN"}
+
+
 # -- Reemplaza esta utilidad --
 def convert_price(price_value: float, currency: Optional[str], usd_mxn_rate: float) -> float:
     """
@@ -70,14 +77,148 @@ def convert_price(price_value: float, currency: Optional[str], usd_mxn_rate: flo
     """
     cur = (str(currency or "")).strip().upper()
 
-    USD_ALIASES = {"USD", "US$", "DOLARES", "DÓLARES", "DOLARES USD", "DÓLARES USD"}
-    MXN_ALIASES = {"MXN", "MEX", "PESOS", "PESOS MXN", "MN"}
-
     if cur in USD_ALIASES:
         return round(float(price_value) * float(usd_mxn_rate), 2)
     # Si explícitamente es MXN (o cualquier otra cosa), no convertir
     return round(float(price_value), 2)
 
+# ========= Lotes columnares =========
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class RecordBatch:
+    """
+    Lote de registros en columnas (en lugar de un dict por fila).
+    - source: hoja del Excel o "pdf"
+    - offset: posición del primer registro del lote dentro de su fuente
+    """
+    source: str
+    offset: int
+    identifiers: List[str]
+    prices: np.ndarray   # float64, ya en MXN
+    stocks: np.ndarray   # int64
+
+    def __len__(self) -> int:
+        return len(self.identifiers)
+
+
+def _column(df: pd.DataFrame, col: Optional[str]) -> Optional[pd.Series]:
+    """df[col] como Series (la primera si hay encabezados repetidos) o None si no existe."""
+    if not col or col not in df.columns:
+        return None
+    s = df[col]
+    if isinstance(s, pd.DataFrame):
+        s = s.iloc[:, 0]
+    return s
+
+
+def to_float_array(series: Optional[pd.Series], length: int) -> np.ndarray:
+    """Versión vectorizada de to_float_safe para una columna completa."""
+    if series is None:
+        return np.zeros(length, dtype=np.float64)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(np.float64).fillna(0.0).to_numpy()
+    s = series.astype(str).str.strip()
+    s = s.str.replace(NUM_RE, "", regex=True).str.replace(",", "", regex=False)
+    return pd.to_numeric(s, errors="coerce").fillna(0.0).to_numpy(dtype=np.float64)
+
+
+def to_int_array(series: Optional[pd.Series], length: int) -> np.ndarray:
+    """Versión vectorizada de to_int_safe (redondeo al par, igual que round())."""
+    return np.rint(to_float_array(series, length)).astype(np.int64)
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    # np.round escala por 100 y difiere de round() en casos como 29.29 * 18.5;
+    # round() nativo por elemento sigue siendo barato y da el mismo centavo que convert_price
+    return np.fromiter((round(v, 2) for v in values.tolist()), dtype=np.float64, count=len(values))
+
+
+def convert_price_array(prices: np.ndarray, currencies, usd_mxn_rate: float) -> np.ndarray:
+    """
+    Versión vectorizada de convert_price. currencies puede ser una Series
+    (una moneda por fila), un str (misma moneda para todas) o None.
+    """
+    if currencies is None or isinstance(currencies, str):
+        is_usd = (str(currencies or "")).strip().upper() in USD_ALIASES
+        return _round2(prices * float(usd_mxn_rate) if is_usd else prices)
+    cur = currencies.astype(str).str.strip().str.upper()
+    is_usd = cur.isin(USD_ALIASES).to_numpy()
+    return _round2(np.where(is_usd, prices * float(usd_mxn_rate), prices))
+
+
+def valid_identifier_mask(series: Optional[pd.Series]):
+    """Identificadores limpios (str.strip) y máscara de los utilizables (no vacíos / nan / none)."""
+    if series is None:
+        return pd.Series([], dtype=object), np.zeros(0, dtype=bool)
+    idents = series.astype(str).str.strip()
+    mask = series.notna() & (idents != "") & ~idents.str.lower().isin(("nan", "none"))
+    return idents, mask.to_numpy(dtype=bool, copy=True)
+
+
+def split_batches(source: str, identifiers, prices: np.ndarray, stocks: np.ndarray,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[RecordBatch]:
+    """Parte columnas ya filtradas en RecordBatch de tamaño fijo."""
+    identifiers = list(identifiers)
+    for start in range(0, len(identifiers), batch_size):
+        stop = start + batch_size
+        yield RecordBatch(source, start, identifiers[start:stop], prices[start:stop], stocks[start:stop])
+
+
+def iter_batch_rows(batches: Iterable[RecordBatch]) -> Iterator[Dict[str, Any]]:
+    """Convierte lotes de vuelta al formato de un dict por fila."""
+    for batch in batches:
+        for ident, price, stock in zip(batch.identifiers, batch.prices.tolist(), batch.stocks.tolist()):
+            yield {"identifier_value": ident, "price": price, "stock": stock}
+
+
+CONSOLIDATION_AGG = {"min": "min", "max": "max", "sum": "sum", "first": "first", "last": "last"}
+
+
+def consolidate_batches(batches: Iterable[RecordBatch], *, price: str = "last", stock: str = "last",
+                        batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Junta los registros repetidos de todo el archivo (un identificador en varias
+    hojas o secciones) con un groupby vectorizado, aplicando la política de
+    precio y de stock. Un precio <= 0 es un precio faltante: no participa en
+    la política y solo queda en 0 si todas las repeticiones lo traen así.
+    Devuelve (lotes_consolidados, duplicados_colapsados); el orden es el de la
+    primera aparición de cada identificador.
+    """
+    if price not in CONSOLIDATION_AGG or price == "sum":
+        raise ValueError(f"Política de precio no soportada: {price!r}")
+    if stock not in CONSOLIDATION_AGG:
+        raise ValueError(f"Política de stock no soportada: {stock!r}")
+
+    batches = list(batches)
+    if not batches:
+        return [], 0
+    df = pd.DataFrame({
+        "identifier_value": [i for b in batches for i in b.identifiers],
+        "price": np.concatenate([b.prices for b in batches]),
+        "stock": np.concatenate([b.stocks for b in batches]),
+    })
+    if not df["identifier_value"].duplicated().any():
+        return batches, 0
+
+    # min/first/last de pandas ignoran NaN
+    df["price"] = df["price"].where(df["price"] > 0)
+    grouped = df.groupby("identifier_value", sort=False).agg(
+        price=("price", CONSOLIDATION_AGG[price]),
+        stock=("stock", CONSOLIDATION_AGG[stock]),
+    )
+    collapsed = len(df) - len(grouped)
+    out = list(split_batches(
+        "consolidado",
+        grouped.index.tolist(),
+        grouped["price"].fillna(0.0).to_numpy(dtype=np.float64),
+        grouped["stock"].to_numpy(dtype=np.int64),
+        batch_size,
+    ))
+    return out, collapsed
+
+
 # ========= Mapeo por proveedor =========
 SUPPLIER_COLUMN_MAP: Dict[str, Dict[str, str]] = {
     # Proveedor A: FILTRADO PROCESADORES INTEL Y AMD 28 JULIO (Excel)
@@ -101,17 +242,45 @@ SUPPLIER_COLUMN_MAP: Dict[str, Dict[str, str]] = {
     },
 }
 
+# ========= Consolidación por proveedor =========
+# - stock_columns: almacenes cuyo stock se suma (sustituye a "stock" del mapeo si alguna existe)
+# - price: en identificadores repetidos dentro del archivo -> "min" | "max" | "first" | "last"
+# - stock: en identificadores repetidos -> "sum" | "max" | "min" | "first" | "last"
+DEFAULT_CONSOLIDATION: Dict[str, Any] = {"stock_columns": [], "price": "last", "stock": "last"}
+SUPPLIER_CONSOLIDATION: Dict[str, Dict[str, Any]] = {
+    # Proveedor B reparte existencias por almacén y repite claves entre secciones
+    "Proveedor B": {
+        "stock_columns": ["cedis", "cen", "gdl"],
+        "price": "min",
+        "stock": "max",
+    },
+}
+
+
+def consolidation_policy_for(supplier_name: str) -> Dict[str, Any]:
+    """Política de SUPPLIER_CONSOLIDATION del proveedor, completada con DEFAULT_CONSOLIDATION."""
+    supplier_key = supplier_name.strip().lower()
+    policy = dict(DEFAULT_CONSOLIDATION)
+    for k, v in SUPPLIER_CONSOLIDATION.items():
+        if k.strip().lower() == supplier_key:
+            policy.update(v)
+            break
+    policy["stock_columns"] = [normalize_header(c) for c in policy["stock_columns"]]
+    return policy
+
 
 # ========= Excel: lectura inteligente de encabezados =========
-def read_with_smart_header(file_bytes, sheet_name, try_rows=15):
+def read_with_smart_header(file_bytes, sheet_name, try_rows=15, nrows: Optional[int] = None):
     """
     Intenta leer la hoja probando varias filas como encabezado y también header de 2 filas.
     Devuelve (df, header_row_usado) o (None, None) si no logra encontrar algo útil.
+    nrows limita las filas de datos leídas (vista previa); None = toda la hoja.
     """
     buf = io.BytesIO(file_bytes)
 
     # 1) primero, sin header para mirar contenido
-    df0 = pd.read_excel(buf, sheet_name=sheet_name, header=None)
+    df0 = pd.read_excel(buf, sheet_name=sheet_name, header=None,
+                        nrows=(try_rows + nrows) if nrows is not None else None)
     if df0 is None or df0.empty:
         return None, None
 
@@ -127,7 +296,7 @@ def read_with_smart_header(file_bytes, sheet_name, try_rows=15):
     max_try = min(try_rows, len(df0))
     for r in range(max_try):
         buf.seek(0)
-        df = pd.read_excel(buf, sheet_name=sheet_name, header=r)
+        df = pd.read_excel(buf, sheet_name=sheet_name, header=r, nrows=nrows)
         if df is None or df.empty:
             continue
         cols_norm = [normalize_header(c) for c in df.columns]
@@ -141,7 +310,7 @@ def read_with_smart_header(file_bytes, sheet_name, try_rows=15):
     # 3) probar header compuesto de 2 filas (multilínea)
     for r in range(max_try - 1):
         buf.seek(0)
-        df = pd.read_excel(buf, sheet_name=sheet_name, header=[r, r + 1])
+        df = pd.read_excel(buf, sheet_name=sheet_name, header=[r, r + 1], nrows=nrows)
         if df is None or df.empty:
             continue
         cols = []
@@ -163,7 +332,7 @@ def read_with_smart_header(file_bytes, sheet_name, try_rows=15):
         row_text = " | ".join([str(x) for x in df0.iloc[r].values])
         if any(k.lower() in row_text.lower() for k in must_keywords) and r + 1 < len(df0):
             buf.seek(0)
-            df = pd.read_excel(buf, sheet_name=sheet_name, header=r)
+            df = pd.read_excel(buf, sheet_name=sheet_name, header=r, nrows=nrows)
             if df is None or df.empty:
                 continue
             cols_norm = [normalize_header(c) for c in df.columns]
@@ -175,93 +344,374 @@ def read_with_smart_header(file_bytes, sheet_name, try_rows=15):
 
 
 # ========= Parser XLSX (A/B y genérico) =========
-def parse_catalog_xlsx(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5) -> Iterable[Dict[str, Any]]:
-    """
-    Devuelve dicts:
-      {'identifier_value': str, 'price': float, 'stock': int}
-    """
-    xls_raw = pd.read_excel(io.BytesIO(file_bytes), sheet_name=None, header=None)
+XLSX_ID_CANDS = {"mpn", "sku", "part", "clave", "modelo", "upc", "ean", "codigo",
+                 "identificador", "upc/ean", "cód._fabricante"}
+XLSX_PRICE_CANDS = {"price", "precio", "unit_price", "p_publico", "p_mayoreo", "costo",
+                    "cost", "p_lista", "precios_pesos_netos"}
+XLSX_STOCK_CANDS = {"stock", "existencia", "qty", "inventario", "cantidad", "existencias",
+                    "disponible", "availability", "cedis", "cen", "gdl"}
+XLSX_CURRENCY_CANDS = {"moneda", "currency"}
 
+
+def _explicit_map_for(supplier_name: str) -> Optional[Dict[str, str]]:
+    """Mapeo de SUPPLIER_COLUMN_MAP para el proveedor (encabezados normalizados) o None."""
     supplier_key = supplier_name.strip().lower()
-    explicit_map = None
     for k, v in SUPPLIER_COLUMN_MAP.items():
         if k.strip().lower() == supplier_key:
-            explicit_map = {kk: normalize_header(vv) for kk, vv in v.items()}
-            break
+            return {kk: normalize_header(vv) for kk, vv in v.items()}
+    return None
+
+
+def _sheet_explicit_map(supplier_name: str, column_map: Optional[Dict[str, Dict[str, str]]],
+                        sheet_name) -> Optional[Dict[str, str]]:
+    """
+    Mapeo de una hoja: el de column_map ({hoja: {id, price, stock, currency}}, p. ej.
+    el confirmado en la vista previa) o, si la hoja no aparece, el del proveedor.
+    """
+    sheet_map = (column_map or {}).get(str(sheet_name))
+    if sheet_map:
+        return {k: normalize_header(v) for k, v in sheet_map.items() if v}
+    return _explicit_map_for(supplier_name)
+
+
+def resolve_xlsx_columns(columns, explicit_map: Optional[Dict[str, str]]) -> Dict[str, Optional[str]]:
+    """Columnas (normalizadas) de id/precio/stock/moneda: del mapeo explícito o por candidatos."""
+    cols = list(columns)
+    currency_col = next((c for c in cols if c in XLSX_CURRENCY_CANDS), None)
+    if explicit_map:
+        return {
+            "id": explicit_map.get("id"),
+            "price": explicit_map.get("price"),
+            "stock": explicit_map.get("stock"),
+            "currency": explicit_map.get("currency") or currency_col,
+        }
+    return {
+        "id": next((c for c in cols if c in XLSX_ID_CANDS), None),
+        "price": next((c for c in cols if c in XLSX_PRICE_CANDS), None),
+        "stock": next((c for c in cols if c in XLSX_STOCK_CANDS), None),
+        "currency": currency_col,
+    }
+
+
+def _xlsx_frame_columns(df: pd.DataFrame, mapping: Dict[str, Optional[str]], usd_mxn_rate: float,
+                        stock_columns: Optional[List[str]] = None):
+    """(identificadores, precios, stocks) de una hoja ya con encabezados, sin iterar filas."""
+    idents, mask = valid_identifier_mask(_column(df, mapping["id"]))
+    if not mask.any():
+        return [], np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64)
+    df = df.loc[mask]
+    n = len(df)
+
+    prices = to_float_array(_column(df, mapping["price"]), n)
+    currency = _column(df, mapping["currency"])
+    prices = convert_price_array(prices, currency.fillna("") if currency is not None else None, usd_mxn_rate)
+    warehouses = [c for c in (stock_columns or []) if c in df.columns]
+    if warehouses:
+        # Suma de existencias de todos los almacenes listados
+        stocks = sum(to_int_array(_column(df, c), n) for c in warehouses)
+    else:
+        stocks = to_int_array(_column(df, mapping["stock"]), n)
+    return idents[mask].tolist(), prices, stocks
+
+
+def _xlsx_sheet_batches(supplier_name: str, file_bytes: bytes, sheet_name,
+                        explicit_map: Optional[Dict[str, str]], usd_mxn_rate: float,
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        stock_columns: Optional[List[str]] = None) -> Iterator[RecordBatch]:
+    """
+    Busca el encabezado de una hoja y convierte sus columnas en lotes, sin iterar filas.
+    Una hoja vacía no entrega nada; una con datos pero sin encabezado útil o sin
+    columna de identificador lanza ValueError.
+    """
+    df, header_row = read_with_smart_header(file_bytes, sheet_name, try_rows=20)
+    if df is None or df.empty:
+        if pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_name, header=None, nrows=1).empty:
+            return  # hoja vacía (portada, notas...)
+        raise ValueError("no se pudo encontrar encabezado útil")
+
+    print(f"[{supplier_name} / {sheet_name}] header_row={header_row}")
+    print("Columnas detectadas:", list(df.columns))
+
+    mapping = resolve_xlsx_columns(df.columns, explicit_map)
+    if not mapping["id"]:
+        raise ValueError(f"no se encontró columna de identificador (cols={df.columns.tolist()})")
+
+    idents, prices, stocks = _xlsx_frame_columns(df, mapping, usd_mxn_rate, stock_columns)
+    yield from split_batches(str(sheet_name), idents, prices, stocks, batch_size)
+
+
+# Bytes del libro en cada proceso del pool (se copian una vez por proceso, no por hoja)
+_WORKER_FILE_BYTES: Optional[bytes] = None
+
+
+def _init_sheet_worker(file_bytes: bytes) -> None:
+    global _WORKER_FILE_BYTES
+    _WORKER_FILE_BYTES = file_bytes
 
-    ID_CANDS = {"mpn", "sku", "part", "clave", "modelo", "upc", "ean", "codigo",
-                "identificador", "upc/ean", "cód._fabricante"}
-    PRICE_CANDS = {"price", "precio", "unit_price", "p_publico", "p_mayoreo", "costo",
-                   "cost", "p_lista", "precios_pesos_netos"}
-    STOCK_CANDS = {"stock", "existencia", "qty", "inventario", "cantidad", "existencias",
-                   "disponible", "availability", "cedis", "cen", "gdl"}
-    CURRENCY_CANDS = {"moneda", "currency"}
 
-    for sheet_name, df0 in xls_raw.items():
+def _xlsx_sheet_worker(supplier_name: str, sheet_name, explicit_map, usd_mxn_rate: float, batch_size: int,
+                       stock_columns: List[str]):
+    """Versión para el pool: devuelve (lotes, error) en vez de generar, para poder serializar."""
+    batches = []
+    try:
+        for b in _xlsx_sheet_batches(supplier_name, _WORKER_FILE_BYTES, sheet_name, explicit_map,
+                                     usd_mxn_rate, batch_size, stock_columns):
+            batches.append(b)
+    except Exception as e:
+        return batches, str(e)
+    return batches, None
+
+
+def parse_catalog_xlsx_batches(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                               sheet_workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE,
+                               column_map: Optional[Dict[str, Dict[str, str]]] = None,
+                               skipped: Optional[List[str]] = None) -> Iterator[RecordBatch]:
+    """
+    Igual que parse_catalog_xlsx pero entrega RecordBatch.
+    column_map: {hoja: {id, price, stock, currency}} reemplaza al mapeo del proveedor
+    en esas hojas, p. ej. el confirmado en la vista previa.
+    Con sheet_workers > 1 las hojas se procesan en paralelo en un pool de procesos;
+    los lotes se entregan en el orden de las hojas y el error de una hoja no
+    detiene a las demás. Cada hoja que falla o no se pudo leer se agrega a
+    skipped como "hoja: motivo" (la corrida quedó parcial).
+    """
+    def skip(sheet_name, error):
+        print(f"❌ Error procesando hoja '{sheet_name}': {error}")
+        if skipped is not None:
+            skipped.append(f"{sheet_name}: {error}")
+
+    sheet_names = pd.ExcelFile(io.BytesIO(file_bytes)).sheet_names
+    stock_columns = consolidation_policy_for(supplier_name)["stock_columns"]
+
+    if sheet_workers > 1 and len(sheet_names) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(sheet_workers, len(sheet_names))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sheet_worker,
+                                 initargs=(file_bytes,)) as pool:
+            futures = [
+                pool.submit(_xlsx_sheet_worker, supplier_name, sheet_name,
+                            _sheet_explicit_map(supplier_name, column_map, sheet_name), usd_mxn_rate,
+                            batch_size, stock_columns)
+                for sheet_name in sheet_names
+            ]
+            for sheet_name, fut in zip(sheet_names, futures):
+                try:
+                    batches, error = fut.result()
+                except Exception as e:  # el proceso murió, p. ej.
+                    batches, error = [], str(e)
+                yield from batches
+                if error:
+                    skip(sheet_name, error)
+        return
+
+    for sheet_name in sheet_names:
         try:
-            if df0 is None or df0.empty:
-                continue
+            yield from _xlsx_sheet_batches(supplier_name, file_bytes, sheet_name,
+                                           _sheet_explicit_map(supplier_name, column_map, sheet_name),
+                                           usd_mxn_rate, batch_size, stock_columns)
+        except Exception as e:
+            skip(sheet_name, e)
 
-            df, header_row = read_with_smart_header(file_bytes, sheet_name, try_rows=20)
-            if df is None or df.empty:
-                print(f"⚠️  No se pudo encontrar encabezado útil en '{sheet_name}'")
-                continue
 
-            print(f"[{supplier_name} / {sheet_name}] header_row={header_row}")
-            print("Columnas detectadas:", list(df.columns))
+def parse_catalog_xlsx(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                       sheet_workers: int = 1) -> Iterable[Dict[str, Any]]:
+    """
+    Devuelve dicts:
+      {'identifier_value': str, 'price': float, 'stock': int}
+    (ver parse_catalog_xlsx_batches para la versión por lotes y sheet_workers).
+    """
+    return iter_batch_rows(
+        parse_catalog_xlsx_batches(supplier_name, file_bytes, usd_mxn_rate=usd_mxn_rate, sheet_workers=sheet_workers)
+    )
 
-            if explicit_map:
-                id_col = explicit_map.get("id")
-                price_col = explicit_map.get("price")
-                stock_col = explicit_map.get("stock")
-                currency_col = next((c for c in df.columns if c in CURRENCY_CANDS), None)
-            else:
-                cols = list(df.columns)
-                id_col = next((c for c in cols if c in ID_CANDS), None)
-                price_col = next((c for c in cols if c in PRICE_CANDS), None)
-                stock_col = next((c for c in cols if c in STOCK_CANDS), None)
-                currency_col = next((c for c in cols if c in CURRENCY_CANDS), None)
-
-            if not id_col:
-                print(f"⚠️  No se encontró columna de identificador en {sheet_name} (cols={df.columns.tolist()})")
+
+# ========= PDF (Proveedor C) =========
+def _page_tables_full(page):
+    """Detección completa de tablas (líneas + intersecciones) de una página."""
+    try:
+        tables = page.extract_tables()
+    except Exception:
+        tables = []
+    dfs = []
+    for tbl in tables or []:
+        if not tbl or len(tbl) < 2:
+            continue
+        dfs.append(pd.DataFrame(tbl))
+    return dfs
+
+
+def learn_pdf_columns(page) -> Optional[Dict[str, Any]]:
+    """
+    Aprende la plantilla de columnas del renglón de encabezados de la página
+    (normalmente la primera): textos del encabezado, límites x de cada columna
+    y la franja vertical que ocupa. Devuelve None si no encuentra encabezado.
+    """
+    try:
+        tables = page.find_tables()
+    except Exception:
+        return None
+    for table in tables:
+        texts = table.extract()
+        for i, row in enumerate(table.rows[:8]):
+            joined = " | ".join(str(x) for x in texts[i]).lower()
+            if not any(k in joined for k in PDF_HEADER_KEYS):
+                continue
+            if any(c is None for c in row.cells):
                 continue
+            return {
+                "headers": [str(t or "") for t in texts[i]],
+                "bounds": [c[0] for c in row.cells] + [row.cells[-1][2]],
+                "top": row.bbox[1],
+                "bottom": row.bbox[3],
+            }
+    return None
 
-            for _, row in df.iterrows():
-                raw_id = _pick_value(row, id_col)
-                if raw_id is None:
-                    continue
-                ident = str(raw_id).strip()
-                if not ident or ident.lower() in ("nan", "none"):
-                    continue
 
-                price_val = to_float_safe(_pick_value(row, price_col)) if price_col else 0.0
-                currency = _pick_value(row, currency_col) if currency_col else None
-                price = convert_price(price_val, currency, usd_mxn_rate)
+# Un renglón de una sola palabra que llega a menos de esto (en anchos de carácter)
+# del borde derecho de la celda es una clave partida, no un salto entre palabras
+PDF_WRAP_EDGE_CHARS = 3
 
-                stock = to_int_safe(_pick_value(row, stock_col)) if stock_col else 0
 
-                yield {"identifier_value": ident, "price": price, "stock": stock}
+def _join_cell(tokens, right: Optional[float] = None) -> str:
+    """
+    Une palabras (top, x0, x1, texto) de una celda: espacio dentro de un renglón,
+    salto entre renglones (como extract_tables). Con right (borde derecho de la
+    columna del identificador) los renglones se unen sin separador si el
+    anterior es una sola palabra partida al llegar al borde, y con espacio si no.
+    """
+    lines, last_top = [], None
+    for top, x0, x1, text in sorted(tokens):
+        if last_top is None or top - last_top > 1.5:
+            lines.append([])
+            last_top = top
+        lines[-1].append((x0, x1, text))
+    if right is None:
+        return "\n".join(" ".join(t for _, _, t in ws) for ws in lines)
+
+    out = ""
+    for i, ws in enumerate(lines):
+        text = " ".join(t for _, _, t in ws)
+        if i:
+            prev = lines[i - 1]
+            x0, x1, word = prev[-1]
+            char_w = (x1 - x0) / max(len(word), 1)
+            broken = len(prev) == 1 and right - x1 < PDF_WRAP_EDGE_CHARS * char_w
+            out += "" if broken else " "
+        out += text
+    return out
+
+
+def _split_at_bounds(word: Dict[str, Any], bounds: List[float]) -> List[Dict[str, Any]]:
+    """
+    Parte una palabra que cruza el límite entre columnas (extract_words junta
+    caracteres separados por menos de x_tolerance, p. ej. el final del modelo
+    con el inicio de la descripción). Requiere extract_words(return_chars=True).
+    """
+    cut = [b for b in bounds[1:-1] if word["x0"] < b < word["x1"]]
+    if not cut:
+        return [word]
+    pieces: List[Dict[str, Any]] = []
+    for ch in word["chars"]:
+        col = bisect_right(bounds, ch["x0"])
+        if not pieces or pieces[-1]["col"] != col:
+            pieces.append({"col": col, "text": "", "x0": ch["x0"], "top": word["top"], "bottom": word["bottom"]})
+        pieces[-1]["text"] += ch["text"]
+        pieces[-1]["x1"] = ch["x1"]
+    return pieces
+
+
+def extract_page_with_columns(page, template: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """
+    Extrae una página usando solo page.extract_words() repartidas en las columnas
+    aprendidas. Cada registro se ancla en la palabra de la columna 'moneda'
+    (o 'precio'), que aparece una vez por fila; las líneas de descripción
+    partidas se asignan al ancla más cercana. Devuelve None si la página no
+    valida contra la plantilla (hay que caer a extract_tables).
+    """
+    headers, bounds = template["headers"], template["bounds"]
+    top, bottom = template["top"], template["bottom"]
+    words = [piece for w in page.extract_words(return_chars=True) for piece in _split_at_bounds(w, bounds)]
+
+    # Validación: el primer encabezado está en el mismo lugar que en la plantilla
+    first = (headers[0].split() or [""])[0].lower()
+    if first and not any(
+        w["text"].lower() == first and top - 2 <= w["top"] <= bottom and bounds[0] <= w["x0"] < bounds[1]
+        for w in words
+    ):
+        return None
+
+    # Franjas de sección (rectángulos delgados a todo el ancho de la tabla)
+    width = bounds[-1] - bounds[0]
+    bands = [
+        (r["top"], r["bottom"]) for r in page.rects
+        if r["top"] >= bottom and r["bottom"] - r["top"] < 15 and r["x1"] - r["x0"] >= 0.9 * width
+    ]
 
-        except Exception as e:
-            print(f"❌ Error procesando hoja '{sheet_name}': {e}")
+    body = []
+    for w in words:
+        if w["top"] < bottom or not (bounds[0] <= w["x0"] < bounds[-1]):
             continue
+        mid = (w["top"] + w["bottom"]) / 2
+        if any(b_top <= mid <= b_bottom for b_top, b_bottom in bands):
+            continue
+        col = bisect_right(bounds, w["x0"]) - 1
+        body.append((w["top"], w["x0"], w["x1"], col, w["text"]))
+    if not body:
+        return pd.DataFrame([headers])
+
+    norm_headers = [normalize_header(h) for h in headers]
+    anchor_col = next(
+        (i for key in PDF_ANCHOR_KEYS for i, h in enumerate(norm_headers) if h.startswith(key)),
+        None,
+    )
+    if anchor_col is None:
+        return None
+    anchors = []
+    for t in sorted(t for t, _, _, col, _ in body if col == anchor_col):
+        if not anchors or t - anchors[-1] > 2:
+            anchors.append(t)
+    if not anchors:
+        return None
 
+    records = [[[] for _ in headers] for _ in anchors]
+    for t, x0, x1, col, text in body:
+        i = bisect_right(anchors, t)
+        if i == len(anchors) or (i > 0 and t - anchors[i - 1] <= anchors[i] - t):
+            i -= 1
+        records[i][col].append((t, x0, x1, text))
+
+    # La columna del identificador no lleva saltos: una clave partida se vuelve a pegar
+    id_col = next((i for i, h in enumerate(norm_headers) if h in PDF_ID_COLS), None)
+    rights = [bounds[i + 1] if i == id_col else None for i in range(len(headers))]
+    rows = [headers] + [
+        [_join_cell(cell, right) or None for cell, right in zip(rec, rights)] for rec in records
+    ]
+    return pd.DataFrame(rows)
+
+
+def extract_tables_from_pdf(file_bytes: bytes, *, learn_columns: bool = False, max_pages: Optional[int] = None):
+    """
+    Extrae tablas crudas de cada página con pdfplumber.
+    Con learn_columns=True aprende las columnas del encabezado de la primera
+    página y lee las demás con extract_words() (mucho más rápido que la
+    detección de líneas); las páginas que no validan usan extract_tables().
+    max_pages limita las páginas leídas (vista previa).
+    """
+    import pdfplumber  # solo quien lee PDF paga esta importación
 
-# ========= PDF (Proveedor C) =========
-def extract_tables_from_pdf(file_bytes: bytes):
-    """Extrae tablas crudas de cada página con pdfplumber."""
     dfs = []
     with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            try:
-                tables = page.extract_tables()
-            except Exception:
-                tables = []
-            for tbl in tables or []:
-                if not tbl or len(tbl) < 2:
+        pages = pdf.pages[:max_pages] if max_pages else pdf.pages
+        template = learn_pdf_columns(pages[0]) if learn_columns and pages else None
+        for page in pages:
+            if template is not None:
+                df = extract_page_with_columns(page, template)
+                if df is not None:
+                    if len(df) >= 2:
+                        dfs.append(df)
                     continue
-                df = pd.DataFrame(tbl)
-                dfs.append(df)
+            dfs.extend(_page_tables_full(page))
     return dfs
 
 
@@ -296,97 +746,176 @@ def normalize_pdf_table(df_raw: pd.DataFrame) -> pd.DataFrame:
     return body
 
 
-def parse_catalog_pdf_tm(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5) -> Iterable[Dict[str, Any]]:
-    """
-    Parser para Proveedor C (PDF).
-    - ID = 'modelo'
-    - Precio = 'precio c/desc.' si existe y es numérico; si no, 'precio'
-    - Convierte USD→MXN según la columna 'moneda' (si falta, asume USD por defecto).
-      * Si prefieres asumir MXN cuando no haya columna, cambia el 'default_currency' más abajo.
-    """
-    raw_tables = extract_tables_from_pdf(file_bytes)
-    if not raw_tables:
-        return
+# Candidatos de columnas del PDF (Proveedor C)
+PDF_ID_COLS         = ["modelo", "clave", "codigo", "código", "mpn"]
+PDF_PRICE_COL_DISC  = ["precio_c/desc.", "precio\nc/desc."]
+PDF_PRICE_COL_BASE  = ["precio", "precio_neto", "precio_publico", "precio_público", "precio_mxn"]
+PDF_STOCK_COLS      = ["existencia", "disponible", "stock", "existencias"]
+PDF_CURRENCY_COLS   = ["moneda", "currency"]
+
+# Cambia este default si quieres asumir MXN cuando no haya columna de moneda
+PDF_DEFAULT_CURRENCY = "USD"
 
-    # Candidatos
-    ID_COLS         = ["modelo", "clave", "codigo", "código", "mpn"]
-    PRICE_COL_DISC  = ["precio_c/desc.", "precio\nc/desc."]
-    PRICE_COL_BASE  = ["precio", "precio_neto", "precio_publico", "precio_público", "precio_mxn"]
-    STOCK_COLS      = ["existencia", "disponible", "stock", "existencias"]
-    CURRENCY_COLS   = ["moneda", "currency"]
 
-    # Cambia este default si quieres asumir MXN cuando no haya columna de moneda
-    default_currency = "USD"
+def resolve_pdf_columns(columns) -> Dict[str, Optional[str]]:
+    """Columnas de una tabla normalizada del PDF: id, precio c/desc., precio base, stock y moneda."""
+    cols = list(columns)
 
-    def pick_first(cols, candidates):
+    def pick_first(candidates):
         for c in candidates:
             if c in cols:
                 return c
         return None
 
+    return {
+        "id": pick_first(["modelo"] + PDF_ID_COLS),
+        "price_disc": pick_first(PDF_PRICE_COL_DISC),
+        "price": pick_first(PDF_PRICE_COL_BASE),
+        "stock": pick_first(PDF_STOCK_COLS),
+        "currency": pick_first(PDF_CURRENCY_COLS),
+    }
+
+
+def _pdf_frame_columns(df: pd.DataFrame, mapping: Dict[str, Optional[str]], usd_mxn_rate: float):
+    """(identificadores, precios, stocks) de una tabla normalizada del PDF, sin iterar filas."""
+    idents, mask = valid_identifier_mask(_column(df, mapping["id"]))
+    # Evita filas de secciones (títulos). Un modelo largo o con espacios
+    # ("TUF GAMING B550M-PLUS WIFI II") no es título si la fila trae moneda.
+    title = (idents.str.len() > 40) | (idents.str.isupper() & idents.str.contains(" ", regex=False))
+    currency = _column(df, mapping["currency"])
+    if currency is not None:
+        title &= currency.isna() | (currency.astype(str).str.strip() == "")
+    mask &= ~title.fillna(False).to_numpy(dtype=bool)
+    if not mask.any():
+        return [], np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64)
+    sub = df.loc[mask]
+    n = len(sub)
+
+    # Lee ambos precios y elige el mejor
+    price_disc = to_float_array(_column(sub, mapping["price_disc"]), n)
+    price_base = to_float_array(_column(sub, mapping["price"]), n)
+    price_val = np.where(price_disc > 0, price_disc, price_base)
+
+    # Moneda (celda vacía = sin conversión, como convert_price(None))
+    currency = _column(sub, mapping["currency"])
+    currency = currency.fillna("") if currency is not None else PDF_DEFAULT_CURRENCY
+
+    return (
+        idents[mask].tolist(),
+        convert_price_array(price_val, currency, usd_mxn_rate),
+        to_int_array(_column(sub, mapping["stock"]), n),
+    )
+
+
+def parse_catalog_pdf_tm_batches(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                                 learn_columns: bool = True,
+                                 batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[RecordBatch]:
+    """
+    Parser para Proveedor C (PDF), por lotes.
+    - learn_columns: todas las páginas comparten layout; aprende las columnas de la
+      primera y lee el resto por palabras (ver extract_tables_from_pdf).
+    - ID = 'modelo'
+    - Precio = 'precio c/desc.' si existe y es numérico; si no, 'precio'
+    - Convierte USD→MXN según la columna 'moneda' (si falta, asume PDF_DEFAULT_CURRENCY).
+    """
+    raw_tables = extract_tables_from_pdf(file_bytes, learn_columns=learn_columns)
+    if not raw_tables:
+        return
+
+    ids_all, prices_all, stocks_all = [], [], []
     for t in raw_tables:
         df = normalize_pdf_table(t)
         if df is None or df.empty:
             continue
 
-        cols = list(df.columns)
-
-        id_col         = pick_first(cols, ["modelo"] + ID_COLS)
-        price_disc_col = pick_first(cols, PRICE_COL_DISC)
-        price_base_col = pick_first(cols, PRICE_COL_BASE)
-        stock_col      = pick_first(cols, STOCK_COLS)
-        currency_col   = pick_first(cols, CURRENCY_COLS)
-
-        if not id_col:
+        mapping = resolve_pdf_columns(df.columns)
+        if not mapping["id"]:
             continue
 
-        for _, row in df.iterrows():
-            ident = _pick_value(row, id_col)
-            if ident is None:
-                continue
+        idents, prices, stocks = _pdf_frame_columns(df, mapping, usd_mxn_rate)
+        ids_all.extend(idents)
+        prices_all.append(prices)
+        stocks_all.append(stocks)
 
-            ident = str(ident).strip()
-            if not ident or ident.lower() in ("nan", "none"):
-                continue
+        print("cols:", list(df.columns))
+        print("id:", mapping["id"], "price_disc:", mapping["price_disc"], "price_base:", mapping["price"],
+              "curr:", mapping["currency"])
 
-            # Evita filas de secciones (títulos)
-            if len(ident) > 40 or (ident.isupper() and " " in ident):
-                continue
+    if ids_all:
+        yield from split_batches("pdf", ids_all, np.concatenate(prices_all), np.concatenate(stocks_all), batch_size)
 
-            # Lee ambos precios
-            disc_raw  = _pick_value(row, price_disc_col) if price_disc_col else None
-            base_raw  = _pick_value(row, price_base_col) if price_base_col else None
-            price_disc = to_float_safe(disc_raw)
-            price_base = to_float_safe(base_raw)
 
-            # Elige mejor precio
-            price_val = price_disc if price_disc > 0 else price_base
+def parse_catalog_pdf_tm(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                         learn_columns: bool = True) -> Iterable[Dict[str, Any]]:
+    """Parser para Proveedor C (PDF), un dict por fila (ver parse_catalog_pdf_tm_batches)."""
+    return iter_batch_rows(
+        parse_catalog_pdf_tm_batches(supplier_name, file_bytes, usd_mxn_rate=usd_mxn_rate, learn_columns=learn_columns)
+    )
 
-            # Moneda
-            currency  = _pick_value(row, currency_col) if currency_col else default_currency
-            price_mxn = convert_price(price_val, currency, usd_mxn_rate)
 
-            # Stock
-            stock = to_int_safe(_pick_value(row, stock_col)) if stock_col else 0
+# ========= Router (ver registry.py) =========
+# El enrutado por proveedor/formato vive en registry.py, que no importa este módulo
+# hasta que hace falta; se re-exporta aquí por compatibilidad.
+from .registry import parse_catalog_batches, preview_catalog  # noqa: E402,F401
 
-            yield {
-                "identifier_value": ident,
-                "price": price_mxn,
-                "stock": stock,
-            }
-        print("cols:", cols)
-        print("id:", id_col, "price_disc:", price_disc_col, "price_base:", price_base_col, "curr:", currency_col)
 
+def parse_catalog_auto(supplier_name: str, file_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                       sheet_workers: int = 1) -> Iterable[Dict[str, Any]]:
+    """Un dict por fila con el parser registrado para el proveedor y formato (ver registry.py)."""
+    return iter_batch_rows(
+        parse_catalog_batches(supplier_name, file_name, file_bytes, usd_mxn_rate=usd_mxn_rate,
+                              sheet_workers=sheet_workers)
+    )
 
-# ========= Router (PDF/XLSX) =========
-def parse_catalog_auto(supplier_name: str, file_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5) -> Iterable[Dict[str, Any]]:
-    """
-    Enruta según extensión y proveedor.
-    - Proveedor C + .pdf -> parse_catalog_pdf_tm
-    - Si es .xlsx/.xls -> parse_catalog_xlsx
-    - Fallback: intenta Excel
-    """
-    name_lower = (file_name or "").lower()
-    if name_lower.endswith(".pdf") and supplier_name.strip().lower() == "proveedor c":
-        return parse_catalog_pdf_tm(supplier_name, file_bytes, usd_mxn_rate=usd_mxn_rate)
-    return parse_catalog_xlsx(supplier_name, file_bytes, usd_mxn_rate=usd_mxn_rate)
+
+# ========= Vista previa (lectura perezosa) =========
+# Leen solo las primeras sample_rows filas de cada hoja (o las primeras pdf_pages
+# páginas del PDF) con la misma detección de encabezado y mapeo que la
+# importación. Devuelven por hoja/tabla:
+#   {'source', 'header_row', 'columns', 'mapping', 'batch', 'error'}
+def preview_catalog_pdf_tm(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                           sample_rows: int = 20, pdf_pages: int = 1) -> List[Dict[str, Any]]:
+    """Vista previa del PDF de Proveedor C."""
+    previews: List[Dict[str, Any]] = []
+    for i, t in enumerate(extract_tables_from_pdf(file_bytes, learn_columns=True, max_pages=pdf_pages)):
+        df = normalize_pdf_table(t)
+        if df is None or df.empty:
+            continue
+        header_row = find_header_row_in_df(t, max_try=8)
+        mapping = resolve_pdf_columns(df.columns)
+        entry = {"source": f"pdf tabla {i + 1}", "header_row": header_row, "columns": list(df.columns),
+                 "mapping": mapping, "batch": None, "error": None}
+        if mapping["id"]:
+            idents, prices, stocks = _pdf_frame_columns(df.head(sample_rows), mapping, usd_mxn_rate)
+            entry["batch"] = RecordBatch(entry["source"], 0, idents, prices, stocks)
+        else:
+            entry["error"] = "Sin columna de identificador"
+        previews.append(entry)
+    return previews
+
+
+def preview_catalog_xlsx(supplier_name: str, file_bytes: bytes, *, usd_mxn_rate: float = 18.5,
+                         sample_rows: int = 20,
+                         column_map: Optional[Dict[str, Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+    """Vista previa de un Excel, hoja por hoja (column_map como en parse_catalog_xlsx_batches)."""
+    previews: List[Dict[str, Any]] = []
+    stock_columns = consolidation_policy_for(supplier_name)["stock_columns"]
+    for sheet_name in pd.ExcelFile(io.BytesIO(file_bytes)).sheet_names:
+        entry = {"source": str(sheet_name), "header_row": None, "columns": [], "mapping": {},
+                 "batch": None, "error": None}
+        previews.append(entry)
+        try:
+            df, header_row = read_with_smart_header(file_bytes, sheet_name, try_rows=20, nrows=sample_rows)
+            if df is None or df.empty:
+                entry["error"] = "No se encontró encabezado útil"
+                continue
+            mapping = resolve_xlsx_columns(df.columns, _sheet_explicit_map(supplier_name, column_map, sheet_name))
+            entry.update(header_row=header_row, columns=list(df.columns), mapping=mapping)
+            if not mapping["id"]:
+                entry["error"] = "Sin columna de identificador"
+                continue
+            idents, prices, stocks = _xlsx_frame_columns(df, mapping, usd_mxn_rate, stock_columns)
+            entry["batch"] = RecordBatch(entry["source"], 0, idents, prices, stocks)
+        except Exception as e:
+            entry["error"] = str(e)
+    return previews
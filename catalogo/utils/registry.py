@@ -0,0 +1,130 @@
+"""
+Registro de parsers de catálogo por (proveedor, formato).
+
+Este módulo no importa pandas, numpy ni pdfplumber: cada parser se registra
+con su ruta "paquete.modulo.funcion" y el backend se importa la primera vez
+que se usa. Así las vistas, el admin y los comandos que no leen catálogos no
+pagan esas importaciones al arrancar.
+
+Para agregar un proveedor sin tocar el enrutador:
+    register_parser("Proveedor D", ["csv"], batches="miapp.parsers.parse_d_batches")
+o en settings.CATALOG_PARSERS:
+    [{"supplier": "Proveedor D", "formats": ["csv"], "batches": "miapp.parsers.parse_d_batches"}]
+
+Un parser recibe (supplier_name, file_bytes, **opciones) y solo las opciones
+que declara en su firma (usd_mxn_rate, sheet_workers, batch_size, column_map,
+skipped, sample_rows, pdf_pages, ...). skipped es una lista donde el parser anota
+las partes del archivo que no pudo leer ("hoja: motivo").
+"""
+from __future__ import annotations
+
+import inspect
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+ANY = "*"
+ParserRef = Union[str, Callable[..., Any]]
+
+
+@dataclass(frozen=True)
+class ParserSpec:
+    batches: ParserRef                   # -> Iterator[RecordBatch]
+    preview: Optional[ParserRef] = None  # -> List[dict] (ver parsers.preview_catalog_xlsx)
+
+
+_REGISTRY: Dict[Tuple[str, str], ParserSpec] = {}
+_settings_loaded = False
+
+
+def _supplier_key(name: str) -> str:
+    return (name or "").strip().lower() or ANY
+
+
+def _format_key(fmt: str) -> str:
+    return (fmt or "").strip().lower().lstrip(".") or ANY
+
+
+def register_parser(supplier: str, formats: Iterable[str], *, batches: ParserRef,
+                    preview: Optional[ParserRef] = None) -> None:
+    """Registra (o reemplaza) el parser de un proveedor para los formatos dados (ANY = cualquiera)."""
+    spec = ParserSpec(batches=batches, preview=preview)
+    for fmt in formats:
+        _REGISTRY[(_supplier_key(supplier), _format_key(fmt))] = spec
+
+
+def _load_settings_parsers() -> None:
+    global _settings_loaded
+    if _settings_loaded:
+        return
+    _settings_loaded = True
+    for entry in getattr(settings, "CATALOG_PARSERS", []):
+        register_parser(entry.get("supplier", ANY), entry.get("formats", [ANY]),
+                        batches=entry["batches"], preview=entry.get("preview"))
+
+
+def resolve_parser(supplier_name: str, file_name: str) -> ParserSpec:
+    """
+    Busca el parser más específico: (proveedor, formato), (cualquiera, formato),
+    (proveedor, cualquiera) y por último (cualquiera, cualquiera).
+    """
+    _load_settings_parsers()
+    supplier = _supplier_key(supplier_name)
+    fmt = _format_key(os.path.splitext(file_name or "")[1])
+    for key in ((supplier, fmt), (ANY, fmt), (supplier, ANY), (ANY, ANY)):
+        if key in _REGISTRY:
+            return _REGISTRY[key]
+    raise ValueError(f"No hay parser para {supplier_name!r} con formato .{fmt}")
+
+
+@lru_cache(maxsize=None)
+def _import_parser(path: str) -> Callable[..., Any]:
+    return import_string(path)
+
+
+@lru_cache(maxsize=None)
+def _accepted_options(func: Callable[..., Any]) -> Optional[frozenset]:
+    """Nombres de opciones que acepta el parser (None si recibe **kwargs)."""
+    params = inspect.signature(func).parameters.values()
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params):
+        return None
+    return frozenset(p.name for p in params)
+
+
+def _call(ref: ParserRef, supplier_name: str, file_bytes: bytes, options: Dict[str, Any]):
+    func = _import_parser(ref) if isinstance(ref, str) else ref
+    accepted = _accepted_options(func)
+    if accepted is not None:
+        options = {k: v for k, v in options.items() if k in accepted}
+    return func(supplier_name, file_bytes, **options)
+
+
+def parse_catalog_batches(supplier_name: str, file_name: str, file_bytes: bytes, **options):
+    """Entrega RecordBatch con el parser registrado para el proveedor y formato del archivo."""
+    return _call(resolve_parser(supplier_name, file_name).batches, supplier_name, file_bytes, options)
+
+
+def preview_catalog(supplier_name: str, file_name: str, file_bytes: bytes, **options) -> List[Dict[str, Any]]:
+    """Vista previa con el parser registrado: {'source', 'header_row', 'columns', 'mapping', 'batch', 'error'}."""
+    spec = resolve_parser(supplier_name, file_name)
+    if spec.preview is None:
+        raise ValueError(f"El parser de {supplier_name!r} no tiene vista previa")
+    return _call(spec.preview, supplier_name, file_bytes, options)
+
+
+# ========= Parsers incluidos =========
+# Excel para cualquier proveedor (también es el fallback); PDF de lista de precios de Proveedor C.
+register_parser(
+    ANY, [ANY],
+    batches="catalogo.utils.parsers.parse_catalog_xlsx_batches",
+    preview="catalogo.utils.parsers.preview_catalog_xlsx",
+)
+register_parser(
+    "Proveedor C", ["pdf"],
+    batches="catalogo.utils.parsers.parse_catalog_pdf_tm_batches",
+    preview="catalogo.utils.parsers.preview_catalog_pdf_tm",
+)
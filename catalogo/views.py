@@ -1,19 +1,166 @@
+import os
+import tempfile
+import time
+import uuid
+
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from django.conf import settings
 
 from .forms import CatalogUploadForm
-from .models import Supplier, ProductIdentifier, SupplierProduct
-from .utils.parsers import parse_catalog_auto
+from .models import Supplier, ProductIdentifier, UnmatchedIdentifier
+from .utils.registry import preview_catalog
+from .services.catalog_import import run_catalog_import
+from .services.unmatched import normalize_identifier
+from .services.export import iter_price_list, iter_csv_lines, write_xlsx
+
+# Archivos en espera de confirmación tras la vista previa
+PREVIEW_DIR = os.path.join(tempfile.gettempdir(), "catalogo_previews")
+PREVIEW_SESSION_KEY = "catalog_preview"
+
+
+def _preview_max_age() -> float:
+    """Segundos que se guarda un archivo en espera (settings.CATALOG_PREVIEW_MAX_HOURS)."""
+    return float(getattr(settings, "CATALOG_PREVIEW_MAX_HOURS", 2)) * 3600
+
+
+def _purge_old_previews() -> None:
+    """Borra los archivos en espera que nadie confirmó a tiempo."""
+    cutoff = time.time() - _preview_max_age()
+    try:
+        entries = list(os.scandir(PREVIEW_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # otro proceso ya lo borró
+
+
+def _import_catalog(request, supplier: Supplier, file_name: str, file_bytes: bytes, column_map=None):
+    """Importa el archivo completo (con puntos de control por lote) y deja el resumen en messages."""
+    job, state = run_catalog_import(supplier, file_name, file_bytes, column_map=column_map)
+    if state == "omitido":
+        messages.info(request, f"Este archivo ya se importó el {timezone.localtime(job.finished_at):%d/%m/%Y %H:%M}; no se repitió.")
+        return
+
+    messages.success(
+        request,
+        f"Catálogo {'reanudado y ' if state == 'reanudado' else ''}procesado: "
+        f"{job.created_links} nuevos, {job.updated_links} actualizados, {job.unmatched_rows} sin coincidencia, "
+        f"{job.stale_rows} desactivados por no aparecer en la lista, {job.collapsed_rows} repetidos consolidados",
+    )
+    if job.notes:
+        messages.warning(request, job.notes)
+    if job.unmatched_rows:
+        sample = list(
+            UnmatchedIdentifier.objects
+            .filter(supplier=supplier, last_seen=job.started_at)
+            .values_list("identifier_value", flat=True)[:20]
+        )
+        messages.warning(
+            request,
+            "Sin coincidencia (guardados en la cola de pendientes) para: "
+            + ", ".join(sample)
+            + (" ..." if job.unmatched_rows > 20 else "")
+        )
+
+
+def _sample_matches(previews):
+    """Empata solo los identificadores de la muestra (sin cargar el mapa completo)."""
+    idents = {i for p in previews if p["batch"] for i in p["batch"].identifiers}
+    lookup = idents | {normalize_identifier(i) for i in idents}
+    found = dict(ProductIdentifier.objects.filter(value__in=lookup).values_list("value", "product__name"))
+    found_norm = {normalize_identifier(k): v for k, v in found.items()}
+    for p in previews:
+        p["rows"] = []
+        if not p["batch"]:
+            continue
+        b = p["batch"]
+        for ident, price, stock in zip(b.identifiers, b.prices.tolist(), b.stocks.tolist()):
+            product = found.get(ident) or found_norm.get(normalize_identifier(ident))
+            p["rows"].append({"identifier_value": ident, "price": price, "stock": stock, "product": product})
+    return previews
+
 
+def _preview_catalog(request, form, supplier: Supplier, file_name: str, file_bytes: bytes):
+    """Guarda el archivo en espera y muestra encabezado, mapeo y una muestra empatada."""
+    usd_mxn = float(getattr(settings, "USD_MXN_RATE", 18.5))
+    previews = preview_catalog(
+        supplier.name,
+        file_name,
+        file_bytes,
+        usd_mxn_rate=usd_mxn,
+        sample_rows=int(getattr(settings, "CATALOG_PREVIEW_ROWS", 20)),
+    )
+    _sample_matches(previews)
 
+    _purge_old_previews()
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    token = uuid.uuid4().hex
+    with open(os.path.join(PREVIEW_DIR, token), "wb") as f:
+        f.write(file_bytes)
+    # Se confirma el mapeo que se mostró, hoja por hoja; el PDF tiene columnas fijas
+    column_map = None
+    if not file_name.lower().endswith(".pdf"):
+        column_map = {p["source"]: p["mapping"] for p in previews if p["mapping"].get("id")} or None
+    request.session[PREVIEW_SESSION_KEY] = {
+        "token": token,
+        "created": time.time(),
+        "supplier_id": supplier.pk,
+        "file_name": file_name,
+        "column_map": column_map,
+    }
+    return render(request, "catalogo/upload.html", {
+        "form": form,
+        "previews": previews,
+        "preview_token": token,
+        "preview_supplier": supplier,
+        "preview_file_name": file_name,
+    })
+
+
+def _confirm_preview(request):
+    """Importa el archivo de la vista previa con el mapeo que se mostró."""
+    pending = request.session.pop(PREVIEW_SESSION_KEY, None)
+    _purge_old_previews()
+    if (not pending or pending["token"] != request.POST.get("preview_token")
+            or time.time() - pending.get("created", 0) > _preview_max_age()):
+        messages.error(request, "La vista previa expiró; vuelve a subir el archivo.")
+        return redirect("catalogo:upload")
+
+    path = os.path.join(PREVIEW_DIR, pending["token"])
+    try:
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+    except OSError:
+        messages.error(request, "No se encontró el archivo de la vista previa; vuelve a subirlo.")
+        return redirect("catalogo:upload")
+
+    try:
+        supplier = Supplier.objects.get(pk=pending["supplier_id"])
+        _import_catalog(request, supplier, pending["file_name"], file_bytes, column_map=pending["column_map"])
+    finally:
+        # Aunque la importación falle: el job guarda su punto de control y se reanuda al volver a subirlo
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return redirect("catalogo:upload")
+
+
+# Sin transacción global: run_catalog_import confirma cada lote junto con su punto de control
 @login_required
-@transaction.atomic
 def upload_catalog(request):
     if request.method == "POST":
+        if request.POST.get("action") == "confirm":
+            return _confirm_preview(request)
+
         form = CatalogUploadForm(request.POST, request.FILES)
         if form.is_valid():
             supplier: Supplier = form.cleaned_data["supplier"]
@@ -23,62 +170,29 @@ def upload_catalog(request):
             file_name = uploaded.name
             file_bytes = uploaded.read()
 
-            # Tipo de cambio (configurable en settings.py)
-            usd_mxn = float(getattr(settings, "USD_MXN_RATE", 18.5))
-
-            # Router: XLSX para A/B, PDF para C (con conversión de moneda)
-            rows = list(
-                parse_catalog_auto(
-                    supplier.name,
-                    file_name,
-                    file_bytes,
-                    usd_mxn_rate=usd_mxn,
-                )
-            )
-
-            updated, created, unmatched = 0, 0, []
-
-            # Mapa de identificadores -> product_id
-            id_map = {pi.value: pi.product_id for pi in ProductIdentifier.objects.all()}
-            id_map_norm = {k.upper().replace(" ", ""): v for k, v in id_map.items()}
-
-            for r in rows:
-                ident = r["identifier_value"].strip()
-                product_id = id_map.get(ident) or id_map_norm.get(ident.upper().replace(" ", ""))
-
-                if not product_id:
-                    unmatched.append(ident)
-                    continue
-
-                _, was_created = SupplierProduct.objects.update_or_create(
-                    supplier=supplier,
-                    identifier_value=ident,
-                    defaults={
-                        "product_id": product_id,
-                        "price": r["price"],
-                        "stock": r["stock"],
-                        "last_seen": timezone.now(),
-                    },
-                )
-                if was_created:
-                    created += 1
-                else:
-                    updated += 1
-
-            messages.success(
-                request,
-                f"Catálogo procesado: {created} nuevos, {updated} actualizados, {len(unmatched)} sin coincidencia",
-            )
-            if unmatched:
-                messages.warning(
-                    request,
-                    "Sin coincidencia para: "
-                    + ", ".join(unmatched[:20])
-                    + (" ..." if len(unmatched) > 20 else "")
-                )
+            if request.POST.get("action") == "preview":
+                return _preview_catalog(request, form, supplier, file_name, file_bytes)
 
+            _import_catalog(request, supplier, file_name, file_bytes)
             return redirect("catalogo:upload")
     else:
         form = CatalogUploadForm()
 
     return render(request, "catalogo/upload.html", {"form": form})
+
+
+@login_required
+def export_price_list(request):
+    """Lista de precios consolidada en CSV (streaming) o XLSX (?format=xlsx)."""
+    stamp = timezone.localdate().strftime("%Y%m%d")
+    rows = iter_price_list(include_inactive=request.GET.get("inactive") == "1")
+    if request.GET.get("format") == "xlsx":
+        # write-only va escribiendo a disco; se manda el archivo ya armado
+        tmp = tempfile.TemporaryFile()
+        write_xlsx(rows, tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=f"lista_precios_{stamp}.xlsx")
+
+    response = StreamingHttpResponse(iter_csv_lines(rows), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="lista_precios_{stamp}.csv"'
+    return response
@@ -5,6 +5,25 @@ SECRET_KEY = 'dev-secret-key'
 DEBUG = True
 ALLOWED_HOSTS = ['*']
 USD_MXN_RATE = 18.50
+# Horas que una oferta puede faltar en la lista del proveedor antes de desactivarse
+STALE_OFFER_GRACE_HOURS = 0
+# Procesos para leer en paralelo las hojas de un Excel (1 = secuencial)
+CATALOG_SHEET_WORKERS = 1
+# Horas que una importación interrumpida sigue siendo reanudable (después se empieza de cero)
+IMPORT_RESUME_MAX_HOURS = 12
+# Horas que se guarda el archivo de una vista previa sin confirmar
+CATALOG_PREVIEW_MAX_HOURS = 2
+
+# Caché en disco (sin servicios externos). Las generaciones que invalidan la caché de
+# ofertas viven en la caché: deben ser compartidas entre el web y `manage.py import_catalog`.
+# Con LocMemCache cada proceso tiene las suyas y no ve las importaciones de los demás;
+# por eso con locmem las ofertas solo se guardan OFFER_CACHE_LOCMEM_TIMEOUT segundos.
+CACHES = {
+ 'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / '.cache'},
+}
+# Segundos que vive la lista de ofertas de un producto (cada importación la invalida antes)
+OFFER_CACHE_TIMEOUT = 60 * 60 * 24
+OFFER_CACHE_LOCMEM_TIMEOUT = 60
 
 INSTALLED_APPS = [
  'django.contrib.admin','django.contrib.auth','django.contrib.contenttypes','django.contrib.sessions',